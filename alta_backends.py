@@ -0,0 +1,594 @@
+"""
+Data-source backends behind the dashboard's ``execute_query``.
+
+``SnowflakeBackend`` runs queries on the warehouse through a bounded
+connection pool and the connector's Arrow fetch path. ``DuckDBBackend`` is
+an in-process stand-in holding synthetic copies of the Orchard tables under
+the same STAGE_PROD.<schema>.<table> names, so the dashboard SQL runs
+unchanged offline without a warehouse or credentials.
+"""
+import itertools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pandas as pd
+
+from alta_telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBackend:
+    """Interface every data source implements."""
+
+    name = "base"
+
+    def __init__(self):
+        self._counter_lock = threading.Lock()
+        self._counters = {"queries": 0, "rows": 0, "errors": 0}
+
+    def start(self):
+        """Open connections / load data eagerly so the first query is fast."""
+
+    def execute(self, query, stream=False, timeout=None):
+        """
+        Run `query`; return a DataFrame, or a ResultBatches iterator if
+        `stream`. The query ID is annotated on the current telemetry span.
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            return dict(self._counters, backend=self.name)
+
+    def close(self):
+        pass
+
+    def _count(self, key, n=1):
+        with self._counter_lock:
+            self._counters[key] += n
+
+
+class ResultBatches:
+    """
+    Iterator over a streamed result set's DataFrame batches. It holds the
+    cursor (and on Snowflake a pooled connection) until it is exhausted or
+    closed, so callers must close it, preferably with ``with``:
+
+        with execute_query(query, stream=True) as batches:
+            for batch in batches:
+                ...
+
+    An iterator dropped without closing is closed when garbage collected.
+    """
+
+    def __init__(self, batches, release):
+        self._batches = batches
+        self._release = release
+        self._close_lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._batches is None:
+            raise StopIteration
+        try:
+            return next(self._batches)
+        except BaseException:
+            # Exhausted or failed: nothing more will be fetched
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Stop fetching and release the cursor/connection; safe to call more than once."""
+        with self._close_lock:
+            batches, self._batches = self._batches, None
+            release, self._release = self._release, None
+        if hasattr(batches, "close"):
+            batches.close()
+        if release is not None:
+            release()
+
+
+# --------------------------- Snowflake ---------------------------
+def snowflake_connect_args(cfg, login_timeout=None, query_tag=None, network_timeout=None) -> dict:
+    """
+    Connector kwargs from a [snowflake] secrets section, with the PEM key
+    parsed to DER. `query_tag` becomes the session's QUERY_TAG, so every
+    statement on it is tagged without an extra ALTER SESSION.
+    `network_timeout` bounds how long the connector waits on a request.
+    """
+    args = dict(
+        user=cfg["user"],
+        account=cfg["account"],
+        warehouse=cfg["warehouse"],
+        database=cfg["database"],
+        schema=cfg["schema"],
+        client_session_keep_alive=True,
+    )
+    if login_timeout:
+        args["login_timeout"] = login_timeout
+    if network_timeout:
+        args["network_timeout"] = network_timeout
+    if query_tag:
+        args["session_parameters"] = {"QUERY_TAG": query_tag}
+    if "private_key" in cfg:
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import serialization
+
+        passphrase = None
+        if "private_key_passphrase" in cfg:
+            passphrase = cfg["private_key_passphrase"].encode()
+
+        p_key = serialization.load_pem_private_key(
+            cfg["private_key"].encode(),
+            password=passphrase,
+            backend=default_backend()
+        )
+
+        args["private_key"] = p_key.private_bytes(
+            encoding=serialization.Encoding.DER,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+    else:
+        args["password"] = cfg["password"]
+    return args
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.last_used = time.monotonic()
+
+
+class SnowflakeConnectionPool:
+    """
+    Bounded, thread-safe pool of Snowflake connections.
+
+    Every query checks out its own connection, so sessions no longer
+    serialize on one shared connection. A connection idle for longer than
+    `keepalive_interval` is health-checked with SELECT 1 before reuse. A
+    background thread pings idle connections on that cadence. It also
+    replaces connections before they reach `max_age`, so token renewal never
+    lands on a viewer's refresh. `start()` opens `min_size` connections
+    eagerly.
+    """
+
+    def __init__(self, connect, size=4, min_size=1, max_age=3000.0, keepalive_interval=300.0):
+        self._connect = connect
+        self.size = size
+        self.min_size = min(min_size, size)
+        self.max_age = max_age
+        self.keepalive_interval = keepalive_interval
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._checked_out = {}
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="snowflake-pool", daemon=True)
+            self._thread.start()
+
+    def acquire(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No Snowflake connection available within {timeout}s")
+        try:
+            entry = self._take_idle() or _PooledConnection(self._connect())
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._checked_out[id(entry.conn)] = entry
+        return entry.conn
+
+    def release(self, conn, discard=False):
+        with self._lock:
+            entry = self._checked_out.pop(id(conn), None)
+        if entry is None:
+            return
+        try:
+            if discard or conn.is_closed() or self._expired(entry):
+                self._close(entry)
+            else:
+                entry.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(entry)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "idle": len(self._idle), "in_use": len(self._checked_out)}
+
+    def _take_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                entry = self._idle.pop()
+            if entry.conn.is_closed() or self._expired(entry):
+                self._close(entry)
+            elif time.monotonic() - entry.last_used < self.keepalive_interval or self._ping(entry):
+                return entry
+            else:
+                self._close(entry)
+
+    def _expired(self, entry, margin=0.0) -> bool:
+        return time.monotonic() - entry.created_at >= self.max_age - margin
+
+    def _ping(self, entry) -> bool:
+        try:
+            cursor = entry.conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception:
+            logger.warning("Dropping unhealthy Snowflake connection", exc_info=True)
+            return False
+        entry.last_used = time.monotonic()
+        return True
+
+    def _close(self, entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def _maintain(self):
+        """Ping idle connections, renew ones that would expire before the next pass, top up to min_size."""
+        with self._lock:
+            pending = list(self._idle)
+        for entry in pending:
+            if not self._slots.acquire(blocking=False):
+                break
+            try:
+                with self._lock:
+                    if entry not in self._idle:
+                        # Checked out (or discarded) since the snapshot
+                        continue
+                    self._idle.remove(entry)
+                if self._expired(entry, margin=self.keepalive_interval) or not self._ping(entry):
+                    self._close(entry)
+                    entry = _PooledConnection(self._connect())
+                with self._lock:
+                    self._idle.append(entry)
+            except Exception:
+                logger.exception("Snowflake pool maintenance failed")
+            finally:
+                self._slots.release()
+
+        while True:
+            with self._lock:
+                if len(self._idle) + len(self._checked_out) >= self.min_size:
+                    return
+            if not self._slots.acquire(blocking=False):
+                return
+            try:
+                entry = _PooledConnection(self._connect())
+                with self._lock:
+                    self._idle.append(entry)
+            except Exception:
+                logger.exception("Snowflake pool warm-up failed")
+                return
+            finally:
+                self._slots.release()
+
+    def _run(self):
+        while True:
+            self._maintain()
+            time.sleep(self.keepalive_interval)
+
+
+def _to_numeric_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn Decimal object columns from the connector into real numeric dtypes."""
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].dropna()
+        if len(values) and isinstance(values.iloc[0], Decimal):
+            df[col] = pd.to_numeric(df[col])
+    return df
+
+
+def sql_string(value: str) -> str:
+    """`value` as a quoted SQL string literal (Snowflake treats backslashes in literals as escapes)."""
+    return "'" + value.replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def _is_auth_error(error: Exception) -> bool:
+    error_msg = str(error)
+    return "authentication token has expired" in error_msg.lower() or "08001" in error_msg
+
+
+class SnowflakeBackend(QueryBackend):
+    """
+    Snowflake warehouse access. Results come back through the connector's
+    Arrow batches rather than the row-by-row DBAPI path, and a query that
+    fails on an expired auth token is retried once on a fresh connection.
+    Waiting for a pooled connection is bounded by `acquire_timeout`,
+    logging in by `login_timeout` and every connector request by
+    `network_timeout`, so a warehouse outage or a dead network connection
+    surfaces as an error instead of a hung caller.
+    """
+
+    name = "snowflake"
+
+    def __init__(
+        self,
+        config,
+        pool_size=4,
+        pool_min_size=1,
+        max_age=3000.0,
+        keepalive_interval=300.0,
+        acquire_timeout=30.0,
+        login_timeout=30,
+        query_tag=None,
+        network_timeout=None,
+    ):
+        super().__init__()
+        self._config = dict(config)
+        self.acquire_timeout = acquire_timeout
+        self.login_timeout = login_timeout
+        self.network_timeout = network_timeout
+        self.query_tag = query_tag
+        self._connect_args = None
+        self._connect_lock = threading.Lock()
+        self.pool = SnowflakeConnectionPool(
+            self._connect,
+            size=pool_size,
+            min_size=pool_min_size,
+            max_age=max_age,
+            keepalive_interval=keepalive_interval,
+        )
+
+    def start(self):
+        self.pool.start()
+
+    def stats(self) -> dict:
+        return dict(super().stats(), pool=self.pool.stats())
+
+    def _connect(self):
+        import snowflake.connector
+
+        with telemetry.span("connect", backend=self.name):
+            # The PEM key is parsed once per process, not on every reconnect
+            with self._connect_lock:
+                if self._connect_args is None:
+                    self._connect_args = snowflake_connect_args(
+                        self._config,
+                        login_timeout=self.login_timeout,
+                        query_tag=self.query_tag,
+                        network_timeout=self.network_timeout,
+                    )
+            try:
+                return snowflake.connector.connect(**self._connect_args)
+            except Exception as e:
+                # If you have 2FA enabled, use RSA key-pair authentication (see README)
+                raise Exception(f"Failed to connect to Snowflake: {e}") from e
+
+    def execute(self, query, stream=False, timeout=None):
+        max_retries = 2
+        for attempt in range(max_retries):
+            conn = self.pool.acquire(timeout=self.acquire_timeout)
+            streaming = False
+            try:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(query, timeout=timeout)
+                    self._count("queries")
+                    telemetry.annotate(query_id=cursor.sfqid)
+                    if stream:
+                        # The batch iterator returns the connection when it is exhausted or closed
+                        streaming = True
+                        return ResultBatches(self._iter_result_batches(cursor), self._stream_release(cursor, conn))
+                    return self._fetch_result_frame(cursor)
+                finally:
+                    if not streaming:
+                        cursor.close()
+            except Exception as e:
+                self._count("errors")
+                if getattr(e, "sfqid", None):
+                    # A statement that failed on the warehouse still used it; keep its ID for the cost ledger
+                    telemetry.annotate(query_id=e.sfqid)
+                if _is_auth_error(e):
+                    # Drop the expired connection instead of returning it to the pool
+                    self.pool.release(conn, discard=True)
+                    conn = None
+                    if attempt < max_retries - 1:
+                        continue
+                    else:
+                        raise Exception(f"Authentication failed after {max_retries} attempts: {e}")
+                else:
+                    # Not an auth error, raise immediately
+                    raise e
+            finally:
+                if conn is not None and not streaming:
+                    self.pool.release(conn)
+
+    def _fetch_result_frame(self, cursor) -> pd.DataFrame:
+        """Fetch the whole result set through the connector's Arrow path."""
+        from snowflake.connector.errors import NotSupportedError
+
+        try:
+            df = cursor.fetch_pandas_all()
+        except NotSupportedError:
+            # Statements without an Arrow result set (SHOW, DESCRIBE, ...)
+            columns = [d[0] for d in cursor.description]
+            df = pd.DataFrame(cursor.fetchall(), columns=columns)
+        self._count("rows", len(df))
+        telemetry.annotate(rows=len(df))
+        return _to_numeric_dtypes(df)
+
+    def _iter_result_batches(self, cursor):
+        """Yield the result set as DataFrame batches, one Arrow chunk at a time."""
+        from snowflake.connector.errors import NotSupportedError
+
+        try:
+            for batch in cursor.fetch_pandas_batches():
+                self._count("rows", len(batch))
+                yield _to_numeric_dtypes(batch)
+        except NotSupportedError:
+            columns = [d[0] for d in cursor.description]
+            batch = pd.DataFrame(cursor.fetchall(), columns=columns)
+            self._count("rows", len(batch))
+            yield _to_numeric_dtypes(batch)
+
+    def _stream_release(self, cursor, conn):
+        def release():
+            try:
+                cursor.close()
+            finally:
+                self.pool.release(conn)
+
+        return release
+
+
+# --------------------------- Local stand-in ---------------------------
+class DuckDBBackend(QueryBackend):
+    """
+    In-process DuckDB database seeded from alta_synthetic. The tables are
+    attached as catalog ``stage_prod`` so the fully qualified Snowflake
+    table names in the dashboard SQL resolve unchanged. With a `path`, the
+    seeded tables are kept in that file and reused on the next start.
+    """
+
+    name = "local"
+
+    def __init__(self, path=None, n_artists=2000, n_days=120, tracks_per_artist=3, seed=0):
+        super().__init__()
+        self.path = path
+        self.seed_options = dict(n_artists=n_artists, n_days=n_days, tracks_per_artist=tracks_per_artist, seed=seed)
+        self._con = None
+        self._lock = threading.Lock()
+        self._query_ids = itertools.count(1)
+
+    def start(self):
+        self._connection()
+
+    def close(self):
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+    def _connection(self):
+        with self._lock:
+            if self._con is None:
+                try:
+                    import duckdb
+                except ImportError as e:
+                    raise ImportError("The local backend needs duckdb: pip install -r requirements-dev.txt") from e
+
+                con = duckdb.connect(":memory:")
+                con.execute(f"ATTACH '{self.path or ':memory:'}' AS stage_prod")
+                try:
+                    con.execute("SELECT 1 FROM stage_prod.streaming.orchard_track_artist_daily LIMIT 1")
+                except duckdb.CatalogException:
+                    self._seed(con)
+                self._con = con
+            return self._con
+
+    def _seed(self, con):
+        from alta_synthetic import generate_orchard_tables
+
+        started = time.perf_counter()
+        tables = generate_orchard_tables(**self.seed_options)
+        for table_name, df in tables.items():
+            catalog, schema, _ = table_name.lower().split(".")
+            con.execute(f"CREATE SCHEMA IF NOT EXISTS {catalog}.{schema}")
+
+            columns = []
+            for col, dtype in df.dtypes.items():
+                if isinstance(dtype, pd.CategoricalDtype) or dtype == object:
+                    columns.append(f"CAST({col} AS VARCHAR) AS {col}")
+                elif pd.api.types.is_datetime64_any_dtype(dtype):
+                    columns.append(f"CAST({col} AS DATE) AS {col}")
+                else:
+                    columns.append(col)
+
+            con.register("seed_frame", df)
+            con.execute(f"CREATE TABLE {table_name} AS SELECT {', '.join(columns)} FROM seed_frame")
+            con.unregister("seed_frame")
+        logger.info("Seeded local backend %s in %.1fs", self.seed_options, time.perf_counter() - started)
+
+    def execute(self, query, stream=False, timeout=None):
+        # Each query gets its own cursor (a connection to the same database) for thread safety
+        cursor = self._connection().cursor()
+        # DuckDB has no query history; its per-query profile stands in for the scan figures
+        cursor.execute("PRAGMA enable_profiling = 'no_output'")
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, cursor.interrupt)
+            timer.daemon = True
+            timer.start()
+        streaming = False
+        try:
+            cursor.execute(query)
+            self._count("queries")
+            telemetry.annotate(query_id=f"local-{next(self._query_ids)}")
+            if stream:
+                streaming = True
+                return ResultBatches(self._iter_result_batches(cursor), self._stream_release(cursor, timer))
+            df = cursor.fetch_df()
+            self._count("rows", len(df))
+            telemetry.annotate(rows=len(df), rows_scanned=_rows_scanned(cursor))
+            return df
+        except Exception:
+            self._count("errors")
+            raise
+        finally:
+            if not streaming:
+                if timer is not None:
+                    timer.cancel()
+                cursor.close()
+
+    def _iter_result_batches(self, cursor):
+        while True:
+            batch = cursor.fetch_df_chunk()
+            if batch.empty:
+                break
+            self._count("rows", len(batch))
+            yield batch
+
+    def _stream_release(self, cursor, timer):
+        def release():
+            if timer is not None:
+                timer.cancel()
+            cursor.close()
+
+        return release
+
+
+def _rows_scanned(cursor):
+    """Rows the last statement on `cursor` read from tables, from its DuckDB profile (None if unavailable)."""
+    try:
+        return json.loads(cursor.get_profiling_information(format="json")).get("cumulative_rows_scanned")
+    except Exception:
+        return None
@@ -0,0 +1,228 @@
+"""
+Per-query warehouse cost accounting.
+
+    cost_ledger.record("streams", span_record, backend="snowflake")
+    cost_ledger.summary()      # per query label, overall and per refresh
+
+Every statement sent through alta_data.execute_query() is recorded here
+as a QueryCost from its telemetry span:
+- query ID
+- label
+- client-side elapsed time
+- rows returned
+
+On Snowflake, the app's sessions carry one static QUERY_TAG (set when each
+connection opens), which picks the dashboard's queries out in the
+warehouse's own history. The per-label breakdown comes from this ledger's
+query ID -> label mapping rather than from per-statement tags.
+
+Scan figures are filled in afterwards, depending on the backend:
+- Snowflake: bytes scanned, partitions scanned/total, server elapsed time
+  and result reuse come from a single QUERY_HISTORY lookup covering every
+  pending query ID (alta_data.resolve_query_costs). The lookup itself
+  needs the warehouse, so it is throttled and skipped while only cheap
+  probes are pending. Its own queries are reported as accounting
+  overhead, not as refresh cost.
+- The local DuckDB stand-in has no query history. It reports rows scanned
+  from DuckDB's own query profile instead.
+
+Queries coalesced by the single-flight layer never reach the backend, so
+they cost nothing and are not recorded. Comparing summaries from before
+and after a caching or pre-aggregation change shows what it saved. The
+dashboard shows the summary at ?view=cost, and `write()` saves it as a
+JSON stats file (cost_stats_file).
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+# Figures summed per label and overall (None where a backend cannot report them)
+SUMMED_FIELDS = (
+    "elapsed_s",
+    "server_elapsed_s",
+    "rows",
+    "rows_scanned",
+    "bytes_scanned",
+    "partitions_scanned",
+    "partitions_total",
+)
+
+
+@dataclass
+class QueryCost:
+    query_id: str
+    label: str
+    backend: str
+    finished_at: datetime
+    elapsed_s: float
+    rows: int = None
+    rows_scanned: int = None
+    server_elapsed_s: float = None
+    bytes_scanned: int = None
+    partitions_scanned: int = None
+    partitions_total: int = None
+    result_cache_hit: bool = None
+    history_lookups: int = 0
+
+    @property
+    def has_history(self) -> bool:
+        return self.bytes_scanned is not None
+
+
+class QueryCostLedger:
+    """
+    The last `keep` recorded queries and the refreshes they served, shared
+    process-wide. Queries labelled with one of `overhead_labels` (the
+    history lookups) are listed per label but left out of the totals.
+    Queries labelled with one of `probe_labels` (the version probes) are
+    answered from metadata and scan nothing anyway, so they are never
+    counted as result cache hits.
+    """
+
+    def __init__(
+        self,
+        keep: int = 5000,
+        max_history_lookups: int = 3,
+        overhead_labels=("query_history",),
+        probe_labels=("source_version", "summary_version"),
+    ):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=keep)
+        self._by_id = {}
+        self._refreshes = 0
+        self._since = datetime.now()
+        self._last_lookup = None
+        self.history_as_of = None
+        self.max_history_lookups = max_history_lookups
+        self.overhead_labels = frozenset(overhead_labels)
+        self.probe_labels = frozenset(probe_labels)
+
+    def record(self, label: str, span: dict, backend: str = None):
+        """Record a finished "query" span; spans without a query ID (rejected or failed before running) are skipped."""
+        query_id = span.get("query_id")
+        if query_id is None:
+            return
+        cost = QueryCost(
+            query_id=str(query_id),
+            label=label,
+            backend=backend or span.get("backend"),
+            finished_at=datetime.fromtimestamp(span.get("ts", datetime.now().timestamp())),
+            elapsed_s=span.get("duration_ms", 0.0) / 1000,
+            rows=span.get("rows"),
+            rows_scanned=span.get("rows_scanned"),
+        )
+        with self._lock:
+            if len(self._entries) == self._entries.maxlen:
+                self._by_id.pop(self._entries[0].query_id, None)
+            self._entries.append(cost)
+            self._by_id[cost.query_id] = cost
+
+    def count_refresh(self):
+        with self._lock:
+            self._refreshes += 1
+
+    def pending(self, exclude_labels=()) -> list:
+        """Query IDs still waiting for warehouse history, oldest first."""
+        with self._lock:
+            return [
+                c.query_id for c in self._entries
+                if not c.has_history and c.history_lookups < self.max_history_lookups and c.label not in exclude_labels
+            ]
+
+    def start_history_lookup(self, min_interval: float) -> bool:
+        """True, and the interval restarted, unless a lookup already started within `min_interval` seconds."""
+        with self._lock:
+            now = time.monotonic()
+            if self._last_lookup is not None and now - self._last_lookup < min_interval:
+                return False
+            self._last_lookup = now
+            return True
+
+    def apply_history(self, rows, looked_up=()):
+        """
+        Fill in warehouse figures from QUERY_HISTORY rows (dicts keyed by the
+        lower-cased column names). IDs in `looked_up` that had no row yet are
+        retried on later lookups, up to max_history_lookups times.
+        """
+        with self._lock:
+            self.history_as_of = datetime.now()
+            for query_id in looked_up:
+                cost = self._by_id.get(query_id)
+                if cost is not None:
+                    cost.history_lookups += 1
+            for row in rows:
+                cost = self._by_id.get(str(row["query_id"]))
+                if cost is None:
+                    continue
+                cost.server_elapsed_s = _number(row.get("total_elapsed_time")) / 1000
+                cost.bytes_scanned = int(_number(row.get("bytes_scanned")))
+                cost.partitions_scanned = int(_number(row.get("partitions_scanned")))
+                cost.partitions_total = int(_number(row.get("partitions_total")))
+                # QUERY_HISTORY has no reuse flag: a reused result scanned nothing and ran on no
+                # warehouse. Metadata-only probes look the same, so they are left undecided.
+                if cost.label not in self.probe_labels:
+                    cost.result_cache_hit = cost.bytes_scanned == 0 and not row.get("warehouse_size")
+
+    def entries(self) -> list:
+        with self._lock:
+            return list(self._entries)
+
+    def summary(self, recent: int = 50) -> dict:
+        """Totals overall, per refresh and per query label, plus the `recent` latest queries."""
+        with self._lock:
+            entries = list(self._entries)
+            refreshes = self._refreshes
+            since = self._since
+            history_as_of = self.history_as_of
+        totals = _aggregate([c for c in entries if c.label not in self.overhead_labels])
+        by_label = {}
+        for cost in entries:
+            by_label.setdefault(cost.label, []).append(cost)
+        return {
+            "since": since.isoformat(),
+            "history_as_of": history_as_of.isoformat() if history_as_of else None,
+            "refreshes": refreshes,
+            "totals": totals,
+            "per_refresh": {
+                k: (v / refreshes if refreshes and v is not None else None)
+                for k, v in totals.items()
+                if k in ("queries", *SUMMED_FIELDS)
+            },
+            "by_query": [dict(label=label, **_aggregate(costs)) for label, costs in sorted(by_label.items())],
+            "recent": [asdict(c) for c in entries[-recent:][::-1]] if recent else [],
+        }
+
+    def gauges(self) -> dict:
+        """Overall totals, for the metrics endpoint."""
+        return {k: v for k, v in self.summary(recent=0)["totals"].items() if v is not None}
+
+    def write(self, path: str):
+        """Save summary() as JSON at `path`, replacing it atomically."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.summary(), f, indent=2, default=str)
+        os.replace(tmp, path)
+
+
+def _number(value) -> float:
+    # NULLs arrive as None or, through pandas, NaN
+    return 0.0 if value is None or value != value else float(value)
+
+
+def _aggregate(costs: list) -> dict:
+    result = {"queries": len(costs)}
+    for field in SUMMED_FIELDS:
+        values = [getattr(c, field) for c in costs if getattr(c, field) is not None]
+        result[field] = sum(values) if values else None
+    with_history = [c for c in costs if c.has_history]
+    result["with_history"] = len(with_history)
+    result["result_cache_hits"] = sum(1 for c in with_history if c.result_cache_hit) if with_history else None
+    return result
+
+
+# Process-wide ledger fed by execute_query
+cost_ledger = QueryCostLedger()
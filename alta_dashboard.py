@@ -1,12 +1,39 @@
+import logging
+import re
+
 import streamlit as st
-import snowflake.connector
 import pandas as pd
-from datetime import datetime
-import os
-import base64
 
-# NEW: safe autorefresh (no sleep/rerun loops)
-from streamlit_autorefresh import st_autorefresh
+from alta_data import (
+    LEADERBOARD_RANKINGS,
+    LEADERBOARD_ROTATION_SECONDS,
+    dashboard_setting,
+    get_artist_leaderboard,
+    get_artist_trends,
+    get_backend,
+    get_circuit_breaker,
+    get_overall_metrics,
+    get_overall_trend,
+    get_query_flight,
+    get_snapshot_refresher,
+    iter_snapshot_stages,
+    resolve_ranking,
+    resolve_window,
+    snapshot_token,
+    start_telemetry,
+)
+from alta_render import (
+    CARD_SPARKLINE,
+    leaderboard_table_html,
+    logo_html,
+    metric_card_html,
+    sparkline_svg,
+    stale_text,
+)
+from alta_cost import cost_ledger
+from alta_telemetry import telemetry
+
+logger = logging.getLogger(__name__)
 
 
 # Page config - must be first Streamlit command
@@ -17,6 +44,9 @@ st.set_page_config(
 )
 
 # --------------------------- CSS ---------------------------
+# Emitted on every full run: Streamlit removes elements a run leaves out.
+# A session that already has it gets a hash reference instead (see
+# minCachedMessageSize in .streamlit/config.toml).
 st.markdown(
     """
 <style>
@@ -130,6 +160,25 @@ st.markdown(
     .metric-delta-down { color: #FF4D4D !important; }
     .metric-delta-flat { color: #AAAAAA !important; }
 
+    .stale-badge { color: #FFB020 !important; font-weight: 800; }
+
+    /* Trend sparklines */
+    .metric-trend { margin-top: 0.3rem; line-height: 0; }
+    .sparkline { display: inline-block; opacity: 0.85; }
+
+    /* Leaderboard */
+    .custom-table { width: 100%; border-collapse: collapse; font-size: 1.1rem; margin: 0; }
+    .custom-table th {
+        padding: 10px 15px;
+        text-align: left;
+        border-bottom: 2px solid #FFFFFF;
+        font-weight: bold;
+        font-size: 1.2rem;
+    }
+    .custom-table td { padding: 8px 15px; border-bottom: 1px solid #333333; }
+    .custom-table tr:hover td { background-color: #1A1A1A !important; }
+    .rank-col { width: 50px; text-align: center !important; }
+
     .stAlert {
         background-color: #1A1A1A !important;
         color: #FFFFFF !important;
@@ -203,439 +252,250 @@ def check_password() -> bool:
 
 
 
-if not check_password():
-    st.stop()
-
-# NEW: clean auto-refresh every 5 minutes (no blocking thread)
-st_autorefresh(interval=300_000, key="tv_refresh")
-
-# --------------------------- Snowflake ---------------------------
-@st.cache_resource(ttl=3600)  # Refresh connection every hour to prevent token expiration
-def get_snowflake_connection():
-    """Create Snowflake connection using Streamlit secrets"""
-    try:
-        if "private_key" in st.secrets["snowflake"]:
-            from cryptography.hazmat.backends import default_backend
-            from cryptography.hazmat.primitives import serialization
-
-            private_key_text = st.secrets["snowflake"]["private_key"]
-
-            passphrase = None
-            if "private_key_passphrase" in st.secrets["snowflake"]:
-                passphrase = st.secrets["snowflake"]["private_key_passphrase"].encode()
-
-            p_key = serialization.load_pem_private_key(
-                private_key_text.encode(),
-                password=passphrase,
-                backend=default_backend()
-            )
-
-            pkb = p_key.private_bytes(
-                encoding=serialization.Encoding.DER,
-                format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption()
-            )
-
-            conn = snowflake.connector.connect(
-                user=st.secrets["snowflake"]["user"],
-                account=st.secrets["snowflake"]["account"],
-                warehouse=st.secrets["snowflake"]["warehouse"],
-                database=st.secrets["snowflake"]["database"],
-                schema=st.secrets["snowflake"]["schema"],
-                private_key=pkb
-            )
-        else:
-            conn = snowflake.connector.connect(
-                user=st.secrets["snowflake"]["user"],
-                password=st.secrets["snowflake"]["password"],
-                account=st.secrets["snowflake"]["account"],
-                warehouse=st.secrets["snowflake"]["warehouse"],
-                database=st.secrets["snowflake"]["database"],
-                schema=st.secrets["snowflake"]["schema"]
-            )
-
-        return conn
-    except Exception as e:
-        st.error(f"Failed to connect to Snowflake: {e}")
-        st.info("If you have 2FA enabled, make sure you're using RSA key-pair authentication (see README)")
-        st.stop()
-
-
-# Helper function to execute queries with auto-reconnect on auth failure
-def execute_query(query):
-    """Execute query with automatic reconnection on auth failure"""
-    max_retries = 2
-    for attempt in range(max_retries):
-        try:
-            conn = get_snowflake_connection()
-            df = pd.read_sql(query, conn)
-            return df
-        except Exception as e:
-            error_msg = str(e)
-            # Check if it's an auth error
-            if "authentication token has expired" in error_msg.lower() or "08001" in error_msg:
-                if attempt < max_retries - 1:
-                    # Clear the cached connection and retry
-                    get_snowflake_connection.clear()
-                    continue
-                else:
-                    raise Exception(f"Authentication failed after {max_retries} attempts: {e}")
-            else:
-                # Not an auth error, raise immediately
-                raise e
-
-
-# --------------------------- Queries ---------------------------
-@st.cache_data(ttl=300)
-def get_overall_metrics():
-    query = """
-    WITH
-
-    max_date AS (
-    SELECT
-    MAX(activity_date) as max_date
-    FROM STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY
-
+# --------------------------- Metrics rendering ---------------------------
+def render_metric_card(label: str, curr_value, prev_value=None, is_int=True, show_delta=True, trend=None):
+    trend_svg = sparkline_svg(trend, *CARD_SPARKLINE) if trend is not None else ""
+    st.markdown(
+        metric_card_html(label, curr_value, prev_value, is_int=is_int, show_delta=show_delta, trend=trend_svg),
+        unsafe_allow_html=True,
     )
 
-    ,tracks AS (
-    SELECT
-    (SELECT(max_date.max_date) FROM max_date) as activity_date,
-    COUNT(DISTINCT CONCAT(artist_name,track_name)) as number_of_tracks
-    FROM STAGE_PROD.METADATA.ORCHARD_METADATA_DAILY
-    WHERE FILE_DATE = (SELECT MAX(FILE_DATE) FROM STAGE_PROD.METADATA.ORCHARD_METADATA_DAILY)
-    GROUP BY 1
-    )
 
-    ,streams AS (
-    SELECT
-    activity_date,
-    artist_name,
-    artist_id,
-    SUM(streams) as total_streams,
-    SUM(listeners) as total_listeners
+def render_leaderboard(snapshot, window):
+    """
+    Top artists for the current ranking. While rankings rotate, only this
+    fragment reruns on each turn: it re-ranks the snapshot's shared window
+    totals, so a turn costs neither a query nor a full script run.
+    """
+    pinned = st.query_params.get("board", "").lower() in {r.key for r in LEADERBOARD_RANKINGS}
+    rotating = LEADERBOARD_ROTATION_SECONDS > 0 and len(LEADERBOARD_RANKINGS) > 1 and not pinned
 
-    FROM STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY
-        WHERE activity_date >= DATEADD(day, -13, (SELECT(max_date.max_date) FROM max_date) )
-            AND activity_date <= (SELECT(max_date.max_date) FROM max_date)
+    @st.fragment(run_every=LEADERBOARD_ROTATION_SECONDS if rotating else None)
+    def _board():
+        ranking = selected_ranking()
+        st.markdown(f"## Top Artists by {ranking.label} ({window.label})")
+        artists = get_artist_leaderboard(snapshot.window_totals(window), ranking=ranking)
+        trends = get_artist_trends(snapshot.grain, artists["artist_name"], ranking.metric)
+        st.markdown(leaderboard_table_html(artists, ranking.key, trends), unsafe_allow_html=True)
 
-    GROUP BY ALL
+    _board()
 
-    )
 
-    ,tiktok AS (
-    SELECT
-    activity_date,
-    artist_name,
-    artist_id,
-    COUNT(distinct ISRC) as isrc_numbers,
-    SUM(video_views) as tiktok_views,
-    SUM(creations) as tiktok_creations
+# --------------------------- Main ---------------------------
+def main(window):
+    logo = logo_html()
+    if logo:
+        st.markdown(logo, unsafe_allow_html=True)
 
-    FROM STAGE_PROD.SOCIALS.ORCHARD_TIKTOK_DAILY
-        WHERE activity_date >= DATEADD(day, -13,(SELECT(max_date.max_date) FROM max_date))
-            AND activity_date <= (SELECT(max_date.max_date) FROM max_date)
+    st.markdown("# ALTA MUSIC GROUP")
 
-    GROUP BY ALL
+    # During a warehouse incident the last good snapshot stays up, flagged as stale
+    stale = stale_text(get_snapshot_refresher().stale_since)
 
-    )
+    try:
+        # Lay out every section up front, then fill each slot as its data lands
+        caption_slot = st.empty()
 
-    ,base AS (
-        SELECT
-            activity_date,
-            artist_name,
-            total_streams,
-            total_listeners,
-            tiktok_views,
-            tiktok_creations,
-            number_of_tracks
-        FROM streams
-        LEFT JOIN tiktok USING(activity_date,artist_id)
-        LEFT JOIN tracks USING(activity_date)
-        )
-        
-        SELECT
-        SUM(CASE WHEN activity_date >= DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date)) THEN total_streams ELSE 0 END)        AS curr_total_streams,
-        SUM(CASE WHEN activity_date >= DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date)) THEN total_listeners ELSE 0 END)      AS curr_total_listeners,
-        COUNT(DISTINCT CASE WHEN activity_date >= DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date)) THEN artist_name END)      AS curr_total_artists,
-        MAX(number_of_tracks)     AS curr_total_tracks,
-        SUM(CASE WHEN activity_date >= DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date)) THEN tiktok_views ELSE 0 END)        AS curr_total_tiktok_views,
-        SUM(CASE WHEN activity_date >= DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date)) THEN tiktok_creations ELSE 0 END)    AS curr_total_tiktok_creations,
-
-        SUM(CASE WHEN activity_date < DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date)) THEN total_streams ELSE 0 END)         AS prev_total_streams,
-        SUM(CASE WHEN activity_date < DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date)) THEN total_listeners ELSE 0 END)       AS prev_total_listeners,
-        COUNT(DISTINCT CASE WHEN activity_date < DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date)) THEN artist_name END)       AS prev_total_artists,
-        MAX(number_of_tracks)     AS  prev_total_tracks,
-        SUM(CASE WHEN activity_date < DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date)) THEN tiktok_views ELSE 0 END)          AS prev_total_tiktok_views,
-        SUM(CASE WHEN activity_date < DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date)) THEN tiktok_creations ELSE 0 END)      AS prev_total_tiktok_creations
-        FROM base;
-    """
-    df = execute_query(query)
-    row = df.iloc[0]
-    return {str(k).lower(): row[k] for k in row.index}
+        st.markdown("<hr style='margin: 2.0rem 0;'>", unsafe_allow_html=True)
+        kpi_slots = [col.empty() for col in st.columns(4)]
 
+        st.markdown("<hr style='margin: 2.0rem 0;'>", unsafe_allow_html=True)
+        col_l, c1, c2, col_r = st.columns([1, 2, 2, 1])
+        artists_slot, tracks_slot = c1.empty(), c2.empty()
 
-@st.cache_data(ttl=300)
-def get_artist_leaderboard():
-    query = """
-    WITH
+        st.markdown("<hr style='margin: 0.5rem 0;'>", unsafe_allow_html=True)
+        leaderboard_slot = st.empty()
+
+        def render_caption(snapshot, metrics):
+            data_as_of = snapshot.data_as_of
+            data_as_of_txt = data_as_of.strftime('%B %d, %Y') if pd.notna(data_as_of) else "n/a"
+            badge = f" • <span class='stale-badge'>{stale}</span>" if stale else ""
+            st.markdown(
+                f"<p>{window.label} • Data as of {data_as_of_txt} • "
+                f"Updated: {snapshot.updated_at.strftime('%B %d, %Y at %I:%M %p')}{badge}</p>",
+                unsafe_allow_html=True
+            )
 
-    max_date AS (
-    SELECT
-    MAX(activity_date) as max_date
-    FROM STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY
+        # (name, parts needed, slot, renderer)
+        sections = [
+            ("caption", {"streams"}, caption_slot, render_caption),
+            ("total_streams", {"streams"}, kpi_slots[0], lambda s, m: render_metric_card("Total Streams", m["curr_total_streams"], m["prev_total_streams"], is_int=True, show_delta=True, trend=get_overall_trend(s.grain, "total_streams"))),
+            ("listeners", {"streams"}, kpi_slots[1], lambda s, m: render_metric_card("Listeners", m["curr_total_listeners"], m["prev_total_listeners"], is_int=True, show_delta=True, trend=get_overall_trend(s.grain, "total_listeners"))),
+            ("tiktok_views", {"streams", "tiktok"}, kpi_slots[2], lambda s, m: render_metric_card("TikTok Views", m["curr_total_tiktok_views"], m["prev_total_tiktok_views"], is_int=True, show_delta=True, trend=get_overall_trend(s.grain, "tiktok_views"))),
+            ("tiktok_creations", {"streams", "tiktok"}, kpi_slots[3], lambda s, m: render_metric_card("TikTok Creations", m["curr_total_tiktok_creations"], m["prev_total_tiktok_creations"], is_int=True, show_delta=True)),
+            ("active_artists", {"streams"}, artists_slot, lambda s, m: render_metric_card("Active Artists", m["curr_total_artists"], show_delta=False)),
+            ("active_tracks", {"catalog"}, tracks_slot, lambda s, m: render_metric_card("Active Tracks", m["curr_total_tracks"], show_delta=False)),
+            ("leaderboard", {"streams", "tiktok"}, leaderboard_slot, lambda s, m: render_leaderboard(s, window)),
+        ]
+
+        snapshot = None
+        for ready, snapshot in iter_snapshot_stages():
+            metrics = get_overall_metrics(snapshot.window_totals(window))
+            for section in [s for s in sections if s[1] <= ready]:
+                name, needs, slot, render = section
+                with telemetry.span("render", section=name), slot.container():
+                    render(snapshot, metrics)
+                sections.remove(section)
+        if not sections:
+            telemetry.milestone("first_full_paint")
 
-    )
+        st.markdown(
+            "<p style='margin-top: 0.5rem !important;'>Dashboard updates automatically when new data lands</p>",
+            unsafe_allow_html=True
+        )
 
-    ,streams AS (
-    SELECT
-    activity_date,
-    artist_name,
-    artist_id,
-    SUM(streams) as total_streams,
-    SUM(listeners) as total_listeners
+        # ?debug=1 shows how many warehouse queries were saved by coalescing
+        if st.query_params.get("debug"):
+            st.json({
+                "query_single_flight": get_query_flight().stats(),
+                "circuit": get_circuit_breaker().stats(),
+                "refresher": get_snapshot_refresher().health(),
+                "backend": get_backend().stats(),
+            })
 
-    FROM STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY
-        WHERE activity_date >= DATEADD(day, -6, (SELECT(max_date.max_date) FROM max_date) )
-            AND activity_date <= (SELECT(max_date.max_date) FROM max_date)
+        return snapshot_token(snapshot), stale
 
-    GROUP BY ALL
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        st.info("Please check your Snowflake connection settings.")
+        return snapshot_token(None), stale
 
-    )
 
-    ,tiktok AS (
-    SELECT
-    activity_date,
-    artist_name,
-    artist_id,
-    COUNT(distinct ISRC) as isrc_numbers,
-    SUM(video_views) as tiktok_views,
-    SUM(creations) as tiktok_creations
+# The change check backs off while nothing changes: after BACKOFF_POLLS
+# unchanged polls its interval doubles, from version_poll_seconds up to
+# version_poll_max_seconds (never past window_rotation_seconds, when set).
+BACKOFF_POLLS = 3
 
-    FROM STAGE_PROD.SOCIALS.ORCHARD_TIKTOK_DAILY
-        WHERE activity_date >= DATEADD(day, -6,(SELECT(max_date.max_date) FROM max_date))
-            AND activity_date <= (SELECT(max_date.max_date) FROM max_date)
 
-    GROUP BY ALL
+def _poll_bounds() -> tuple:
+    base = dashboard_setting("version_poll_seconds", 120.0)
+    longest = max(dashboard_setting("version_poll_max_seconds", 1200.0), base)
+    rotation = dashboard_setting("window_rotation_seconds", 0.0)
+    if rotation > 0:
+        base, longest = min(base, rotation), min(longest, rotation)
+    return base, longest
 
-    )
 
-    ,base AS (
-        SELECT
-            activity_date,
-            artist_name,
-            isrc_numbers,
-            total_streams,
-            total_listeners,
-            tiktok_views,
-            tiktok_creations
-        FROM streams
-        LEFT JOIN tiktok USING(activity_date,artist_id)
-        )
-        
-        SELECT 
-            artist_name,
-            COALESCE(SUM(total_streams), 0) as streams,
-            COALESCE(SUM(tiktok_views), 0) as tiktok_views
-        FROM  base
-        GROUP BY artist_name
-        ORDER BY streams DESC
-        LIMIT 10
+def watch_for_changes(rendered_token, window):
     """
-    return execute_query(query)
-
-
-# --------------------------- Metrics rendering ---------------------------
-def _pct_change(curr: float, prev: float) -> float:
-    curr = float(curr or 0)
-    prev = float(prev or 0)
-    if prev == 0:
-        return 0.0 if curr == 0 else 1.0
-    return (curr - prev) / prev
-
+    Replaces the fixed 5-minute autorefresh. A tiny fragment re-runs on a
+    backing-off interval and only compares the refresher's snapshot token
+    and stale badge (and the rotation window) with what this page rendered.
+    The full script reruns only when one of them changed, which also resets
+    the interval, or to apply a longer interval: a fragment's run_every is
+    only picked up when the whole page runs.
+    """
+    base, longest = _poll_bounds()
+    interval = min(max(st.session_state.get("poll_interval", base), base), longest)
+
+    @st.fragment(run_every=interval)
+    def _check():
+        refresher = get_snapshot_refresher()
+        current = (snapshot_token(refresher.peek()), stale_text(refresher.stale_since))
+        # Until the first refresh lands there is nothing newer than the partial snapshot on screen
+        if current != (None, None) and current != rendered_token:
+            reason = "data"
+        elif selected_window() != window:
+            reason = "window"
+        else:
+            unchanged = st.session_state["unchanged_polls"] = st.session_state.get("unchanged_polls", 0) + 1
+            if interval >= longest or unchanged < BACKOFF_POLLS:
+                return
+            st.session_state["poll_interval"] = min(interval * 2, longest)
+            st.session_state["unchanged_polls"] = 0
+            telemetry.count("change_reruns", reason="backoff")
+            st.rerun(scope="app")
+        if reason == "data":
+            st.session_state["poll_interval"] = base
+        st.session_state["unchanged_polls"] = 0
+        telemetry.count("change_reruns", reason=reason)
+        st.rerun(scope="app")
 
-def render_metric_card(label: str, curr_value, prev_value=None, is_int=True, show_delta=True):
-    curr = float(curr_value or 0)
-    prev = float(prev_value or 0) if prev_value is not None else None
+    _check()
 
-    value_txt = f"{int(curr):,}" if is_int else f"{curr:.1f}"
 
-    if (not show_delta) or (prev is None):
-        st.markdown(
-            f"""
-            <div class="metric-card">
-              <div class="metric-label">{label}</div>
-              <div class="metric-value">{value_txt}</div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-        return
+def render_metrics_page():
+    """?view=metrics: the same Prometheus text the metrics endpoint serves."""
+    st.markdown("## Dashboard telemetry")
+    st.code(telemetry.prometheus_text(), language="text")
 
-    pct = _pct_change(curr, prev)
 
-    if curr > prev:
-        arrow = "▲"
-        cls = "metric-delta-up"
-    elif curr < prev:
-        arrow = "▼"
-        cls = "metric-delta-down"
+def render_cost_page():
+    """
+    ?view=cost: what the recorded warehouse queries scanned, overall, per
+    refresh and per query. Reads the ledger as the refresher last resolved
+    it; viewing the page never queries the warehouse.
+    """
+    st.markdown("## Warehouse query cost")
+    summary = cost_ledger.summary()
+    history_as_of = summary["history_as_of"]
+    # From the setting, not get_backend(): reading the ledger must not need a connection
+    if dashboard_setting("backend", "snowflake") != "snowflake":
+        history_txt = "rows scanned from the local query profile"
+    elif history_as_of:
+        history_txt = f"warehouse figures as of {history_as_of[:16].replace('T', ' ')}"
     else:
-        arrow = "—"
-        cls = "metric-delta-flat"
-
-    sign = "+" if pct > 0 else ""
-    pct_txt = f"{sign}{pct*100:.0f}%"
-
+        history_txt = "no warehouse figures yet"
     st.markdown(
-        f"""
-        <div class="metric-card">
-          <div class="metric-label">{label}</div>
-          <div class="metric-value">{value_txt}</div>
-          <div class="metric-delta {cls}">{arrow} {pct_txt}</div>
-        </div>
-        """,
-        unsafe_allow_html=True
+        f"<p>{summary['totals']['queries']:,} queries over {summary['refreshes']:,} refreshes "
+        f"since {summary['since'][:16].replace('T', ' ')} • {history_txt}</p>",
+        unsafe_allow_html=True,
     )
+    st.markdown("### Per refresh")
+    st.dataframe(pd.DataFrame([summary["per_refresh"]]), hide_index=True)
+    st.markdown("### By query")
+    st.dataframe(pd.DataFrame(summary["by_query"]), hide_index=True)
+    st.markdown("### Recent queries")
+    st.dataframe(pd.DataFrame(summary["recent"]), hide_index=True)
 
 
-# --------------------------- Main ---------------------------
-def main():
-    logo_path = "./components/ALTA-ICON-CIRCLE-(WHITE).png"
-
-    if os.path.exists(logo_path):
-        with open(logo_path, "rb") as f:
-            logo_data = base64.b64encode(f.read()).decode()
+def selected_window():
+    """?window=28d pins a comparison window; otherwise see resolve_window()."""
+    return resolve_window(st.query_params.get("window"))
 
-        st.markdown(
-            f"""
-            <div class="logo-wrap">
-                <img class="logo-img" src="data:image/png;base64,{logo_data}" width="160" />
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
 
-    st.markdown("# ALTA MUSIC GROUP")
-    st.markdown(
-        f"<p>Last 7 Days • Updated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>",
-        unsafe_allow_html=True
-    )
-
-    try:
-        metrics = get_overall_metrics()
-        artists = get_artist_leaderboard()
-
-        st.markdown("<hr style='margin: 2.0rem 0;'>", unsafe_allow_html=True)
-        col1, col2, col3, col4 = st.columns(4)
+def selected_ranking():
+    """?board=growth pins a leaderboard ranking; otherwise see resolve_ranking()."""
+    return resolve_ranking(st.query_params.get("board"))
 
-        with col1:
-            render_metric_card("Total Streams", metrics["curr_total_streams"], metrics["prev_total_streams"], is_int=True, show_delta=True)
-        with col2:
-            render_metric_card("Listeners", metrics["curr_total_listeners"], metrics["prev_total_listeners"], is_int=True, show_delta=True)
-        with col3:
-            render_metric_card("TikTok Views", metrics["curr_total_tiktok_views"], metrics["prev_total_tiktok_views"], is_int=True, show_delta=True)
-        with col4:
-            render_metric_card("TikTok Creations", metrics["curr_total_tiktok_creations"], metrics["prev_total_tiktok_creations"], is_int=True, show_delta=True)
 
-        st.markdown("<hr style='margin: 2.0rem 0;'>", unsafe_allow_html=True)
-        col_l, c1, c2, col_r = st.columns([1, 2, 2, 1])
+# ?screen= comes from the URL, so it is checked before it becomes a telemetry
+# label: against the comma-separated `screens` setting if one is configured,
+# otherwise for a short plain name. Anything else is counted as "other".
+SCREEN_NAMES = frozenset(s.strip() for s in dashboard_setting("screens", "").split(",") if s.strip())
+_SCREEN_NAME = re.compile(r"[A-Za-z0-9_-]{1,32}")
 
-        with c1:
-            render_metric_card("Active Artists", metrics["curr_total_artists"], show_delta=False)
-        with c2:
-            render_metric_card("Active Tracks", metrics["curr_total_tracks"], show_delta=False)
 
-        # Artist leaderboard (unchanged)
-        st.markdown("<hr style='margin: 0.5rem 0;'>", unsafe_allow_html=True)
-        st.markdown("## Top Artists (Last 7 Days)")
-
-        import streamlit.components.v1 as components
-
-        html_content = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-        <style>
-        body {
-            background-color: #000000;
-            margin: 0;
-            padding: 0;
-            font-family: 'Special Gothic', sans-serif;
-        }
-        .custom-table {
-            width: 100%;
-            background-color: #000000 !important;
-            color: #FFFFFF !important;
-            border-collapse: collapse;
-            font-size: 1.1rem;
-            margin: 0;
-        }
-        .custom-table th {
-            background-color: #000000 !important;
-            color: #FFFFFF !important;
-            padding: 10px 15px;
-            text-align: left;
-            border-bottom: 2px solid #FFFFFF;
-            font-weight: bold;
-            font-size: 1.2rem;
-        }
-        .custom-table td {
-            background-color: #000000 !important;
-            color: #FFFFFF !important;
-            padding: 8px 15px;
-            border-bottom: 1px solid #333333;
-        }
-        .custom-table tr:hover td {
-            background-color: #1A1A1A !important;
-        }
-        .rank-col {
-            width: 50px;
-            text-align: center;
-        }
-        </style>
-        </head>
-        <body>
-        <table class="custom-table">
-        <thead>
-        <tr>
-            <th class="rank-col">#</th>
-            <th>Artist</th>
-            <th>Streams</th>
-            <th>TikTok Views</th>
-        </tr>
-        </thead>
-        <tbody>
-        """
-        for idx in range(min(10, len(artists))):
-            row = artists.iloc[idx]
-            html_content += f"""
-            <tr>
-                <td class="rank-col">{idx + 1}</td>
-                <td>{row['ARTIST_NAME']}</td>
-                <td>{int(row['STREAMS']):,}</td>
-                <td>{int(row['TIKTOK_VIEWS']):,}</td>
-            </tr>
-            """
-
-        html_content += """
-        </tbody>
-        </table>
-        </body>
-        </html>
-        """
-
-        components.html(html_content, height=450, scrolling=False)
+def _screen_id() -> str:
+    """Per-TV label for telemetry, from ?screen=<name>."""
+    screen = st.query_params.get("screen", "default")
+    if screen == "default" or (screen in SCREEN_NAMES if SCREEN_NAMES else _SCREEN_NAME.fullmatch(screen)):
+        return screen
+    return "other"
 
-        st.markdown(
-            "<p style='margin-top: 0.5rem !important;'>Dashboard auto-refreshes every 5 minutes</p>",
-            unsafe_allow_html=True
-        )
 
-    except Exception as e:
-        st.error(f"Error loading data: {e}")
-        st.info("Please check your Snowflake connection settings.")
+# Open pooled connections before the first viewer gets past the password screen.
+# A failure here must not reach visitors who have not logged in: neither call
+# is cached when it raises, so the page retries once authenticated and shows
+# the error there.
+try:
+    start_telemetry()
+    get_backend()
+except Exception:
+    logger.exception("Backend warm-up failed; retrying after login")
 
+with telemetry.span("auth", screen=_screen_id()):
+    authenticated = check_password()
+if not authenticated:
+    st.stop()
 
 if __name__ == "__main__":
-    main()
+    if st.query_params.get("view") == "metrics":
+        render_metrics_page()
+    elif st.query_params.get("view") == "cost":
+        render_cost_page()
+    else:
+        window = selected_window()
+        with telemetry.span("rerun", screen=_screen_id(), window=window.key):
+            rendered = main(window)
+        watch_for_changes(rendered, window)
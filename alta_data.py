@@ -0,0 +1,1077 @@
+"""
+Data layer for the dashboard: settings, the process-wide backend and query
+helpers, the artist x day snapshot and its background refresher, and the
+KPI / leaderboard aggregations computed from it.
+
+Nothing here renders anything, so benchmarks and other tools can import it
+without starting the Streamlit page.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from datetime import datetime
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from alta_backends import DuckDBBackend, QueryBackend, SnowflakeBackend, sql_string
+from alta_cost import cost_ledger
+from alta_rollup import (
+    METRIC_COLUMNS,
+    RANKINGS,
+    ArtistDayRing,
+    DailyGrain,
+    LeaderboardRanking,
+    WindowTotals,
+    parse_rankings,
+    parse_windows,
+)
+from alta_store import SnapshotStore, fingerprint
+from alta_telemetry import configure_json_log, serve_metrics, telemetry
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------------- Settings ---------------------------
+def dashboard_setting(key, default):
+    """
+    Optional tuning value: the ALTA_<KEY> environment variable if set,
+    otherwise the [dashboard] section of st.secrets.
+    """
+    value = os.environ.get(f"ALTA_{key.upper()}")
+    if value is None:
+        try:
+            value = st.secrets.get("dashboard", {}).get(key, default)
+        except FileNotFoundError:
+            value = default
+    if default is None or value is None:
+        return value
+    if isinstance(default, bool) and isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return type(default)(value)
+
+
+# --------------------------- Data source ---------------------------
+@st.cache_resource
+def get_backend() -> QueryBackend:
+    """
+    Process-wide data source, warmed up as soon as it is created.
+    backend = "snowflake" (default) uses st.secrets["snowflake"];
+    backend = "local" runs on a synthetic DuckDB copy of the source tables.
+    """
+    if dashboard_setting("backend", "snowflake") == "local":
+        backend = DuckDBBackend(
+            path=dashboard_setting("local_db_path", None),
+            n_artists=dashboard_setting("local_artists", 2000),
+            n_days=dashboard_setting("local_days", 120),
+            tracks_per_artist=dashboard_setting("local_tracks_per_artist", 3),
+            seed=dashboard_setting("local_seed", 0),
+        )
+    else:
+        backend = SnowflakeBackend(
+            st.secrets["snowflake"],
+            pool_size=dashboard_setting("pool_size", 4),
+            pool_min_size=dashboard_setting("pool_min_size", 1),
+            max_age=dashboard_setting("connection_max_age_seconds", 3000.0),
+            keepalive_interval=dashboard_setting("keepalive_seconds", 300.0),
+            acquire_timeout=dashboard_setting("pool_acquire_timeout_seconds", 30.0),
+            login_timeout=dashboard_setting("login_timeout_seconds", 30),
+            query_tag=dashboard_setting("query_tag", "alta-dashboard"),
+            network_timeout=dashboard_setting("network_timeout_seconds", _query_timeout() + FETCH_SLACK_SECONDS),
+        )
+    backend.start()
+    return backend
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one execution.
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for and share its result (or its exception). A
+    `timeout` bounds that wait: a follower still waiting after `timeout`
+    seconds raises TimeoutError, while the leader's call carries on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {"requests": 0, "executions": 0, "coalesced": 0, "errors": 0, "timeouts": 0}
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            self._counters["requests"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _InFlightCall()
+                self._counters["executions"] += 1
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self._counters["timeouts"] += 1
+                raise TimeoutError(f"Shared query still running after {timeout}s")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, in_flight=len(self._calls))
+
+
+@st.cache_resource
+def get_query_flight() -> SingleFlight:
+    """Process-wide single-flight group shared by every session's queries."""
+    return SingleFlight()
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of querying while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops sending queries to a failing warehouse. After `threshold`
+    consecutive failures the circuit opens, and for `cooldown` seconds every
+    call raises CircuitOpenError at once. After that, one trial call is let
+    through: success closes the circuit, failure opens it for another
+    cooldown.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._counters = {"trips": 0, "rejected": 0}
+
+    def call(self, fn):
+        with self._lock:
+            if self._opened_at is not None:
+                remaining = self._opened_at + self.cooldown - time.monotonic()
+                if remaining > 0 or self._trial_in_flight:
+                    self._counters["rejected"] += 1
+                    raise CircuitOpenError(
+                        f"Warehouse circuit open after {self._failures} consecutive failures; "
+                        f"retrying in {max(remaining, 0):.0f}s"
+                    )
+                self._trial_in_flight = True
+
+        try:
+            result = fn()
+        except Exception:
+            with self._lock:
+                self._trial_in_flight = False
+                self._failures += 1
+                if self._opened_at is not None or self._failures >= self.threshold:
+                    if self._opened_at is None:
+                        self._counters["trips"] += 1
+                    self._opened_at = time.monotonic()
+            raise
+        with self._lock:
+            self._trial_in_flight = False
+            self._failures = 0
+            self._opened_at = None
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, open=int(self._opened_at is not None), consecutive_failures=self._failures)
+
+
+@st.cache_resource
+def get_circuit_breaker() -> CircuitBreaker:
+    """Process-wide breaker in front of every warehouse query."""
+    return CircuitBreaker(
+        threshold=dashboard_setting("circuit_failure_threshold", 3),
+        cooldown=dashboard_setting("circuit_cooldown_seconds", 60.0),
+    )
+
+
+# Statements run on sessions tagged with the query_tag setting (Snowflake
+# QUERY_TAG) and are recorded by label in alta_cost's ledger; cost_stats_file
+# also saves its summary as JSON (see save_query_costs).
+COST_STATS_FILE = dashboard_setting("cost_stats_file", "")
+# Warehouse history is looked up at most this often, and only once real data
+# queries (not just the version probes) are waiting for it
+COST_HISTORY_SECONDS = dashboard_setting("cost_history_seconds", 900.0)
+PROBE_QUERY_LABELS = cost_ledger.probe_labels
+# Statements are cancelled server-side after their timeout; waits on the client
+# side allow this much longer, which covers fetching the result.
+FETCH_SLACK_SECONDS = 30.0
+
+
+def execute_query(query, stream=False, timeout=None, label="adhoc"):
+    """Execute query on the configured backend (see alta_backends).
+
+    Returns a DataFrame. With ``stream=True`` a ResultBatches iterator of
+    DataFrame batches is returned instead, so large results never have to be
+    held in memory all at once. It holds a pooled connection until it is
+    exhausted or closed, so callers must close it (use it in a ``with``).
+
+    Concurrent non-streaming calls with the same query text are coalesced:
+    only one of them reaches Snowflake and the rest share its result.
+    `timeout` (seconds) makes Snowflake cancel the statement if it runs longer,
+    and callers coalesced onto it stop waiting FETCH_SLACK_SECONDS after that.
+    While the circuit breaker is open this raises CircuitOpenError at once.
+    `label` names the query in telemetry and the cost ledger.
+    """
+    backend = get_backend()
+    breaker = get_circuit_breaker()
+
+    def run(stream=False):
+        try:
+            with telemetry.span("query", query=label, backend=backend.name) as record:
+                return breaker.call(lambda: backend.execute(query, stream=stream, timeout=timeout))
+        finally:
+            # Also for failures: a statement that ran on the warehouse before failing has a query ID and cost
+            cost_ledger.record(label, record, backend=backend.name)
+
+    if stream:
+        return run(stream=True)
+
+    wait = None if timeout is None else timeout + FETCH_SLACK_SECONDS
+    df = get_query_flight().do(query, run, timeout=wait)
+    # Callers may rename/convert columns, so never hand out the shared frame
+    return df.copy(deep=False)
+
+
+# --------------------------- Queries ---------------------------
+# Both the KPI cards and the leaderboard are derived from one artist x day
+# snapshot covering the current and previous periods of every comparison
+# window offered (windows = "7d,28d,mtd" by default, 62 days). The snapshot
+# is a dense artist x day cube, so its span comes from the windows alone:
+# "90d" (180 days) and "ytd" (two years) are opt-in. The sparklines draw the
+# last trend_days of it (all of it by default).
+WINDOW_DAYS = 7
+DASHBOARD_WINDOWS = parse_windows(dashboard_setting("windows", "7d,28d,mtd"))
+SNAPSHOT_DAYS = max(w.history_days for w in DASHBOARD_WINDOWS)
+TREND_DAYS = dashboard_setting("trend_days", SNAPSHOT_DAYS)
+if TREND_DAYS > SNAPSHOT_DAYS:
+    logger.warning(
+        "trend_days=%s exceeds the %s days the configured windows keep; trends show %s days",
+        TREND_DAYS, SNAPSHOT_DAYS, SNAPSHOT_DAYS,
+    )
+# Anything beyond two 7-day windows is kept in an incremental ArtistDayRing by
+# default, so refreshes (including the max_age refetch) only scan new days
+# rather than the whole history. The ring is reloaded in full once every
+# rollup_full_reload_seconds to pick up corrections to older days.
+INCREMENTAL_ROLLUP = dashboard_setting("incremental_rollup", SNAPSHOT_DAYS > 2 * WINDOW_DAYS)
+
+
+# The leaderboard rotates through these orders, all ranked from the same
+# per-artist window totals (see LeaderboardRanking). Rotation on the Streamlit
+# page is opt-in, like window_rotation_seconds: each turn is a server-side
+# fragment run on every screen. The kiosk rotates in the browser for free
+# (kiosk_rotation_seconds).
+LEADERBOARD_RANKINGS = parse_rankings(
+    dashboard_setting("leaderboard_rankings", "streams,tiktok_views,tiktok_creations,growth")
+)
+LEADERBOARD_ROTATION_SECONDS = dashboard_setting("leaderboard_rotation_seconds", 0.0)
+
+
+def _rotate(options: list, key: str, period: float):
+    """
+    The option named `key`; without a valid key, the one whose turn it is
+    when rotating every `period` seconds (0 stays on the first). Rotation
+    follows the wall clock, so all screens change together.
+    """
+    by_key = {o.key: o for o in options}
+    if key and key.lower() in by_key:
+        return by_key[key.lower()]
+    if period > 0:
+        return options[int(time.time() // period) % len(options)]
+    return options[0]
+
+
+def resolve_window(key: str = None):
+    """The DASHBOARD_WINDOWS entry named `key` (e.g. "28d"), or the current one of window_rotation_seconds."""
+    if key and key.lower() not in {w.key for w in DASHBOARD_WINDOWS}:
+        logger.warning(
+            "Window %r is not among the configured windows (%s); showing the default",
+            key[:32], ", ".join(w.key for w in DASHBOARD_WINDOWS),
+        )
+    return _rotate(DASHBOARD_WINDOWS, key, dashboard_setting("window_rotation_seconds", 0.0))
+
+
+def resolve_ranking(key: str = None) -> LeaderboardRanking:
+    """The LEADERBOARD_RANKINGS entry named `key` (e.g. "growth"), or the current one of leaderboard_rotation_seconds."""
+    return _rotate(LEADERBOARD_RANKINGS, key, LEADERBOARD_ROTATION_SECONDS)
+
+
+# source = "raw" (default) aggregates the Orchard fact tables at read time;
+# source = "rollup" reads the summary tables that alta_summary.py materializes
+# once per data load, so every refresh query is a small point read.
+SNAPSHOT_SOURCE = dashboard_setting("source", "raw")
+SUMMARY_SCHEMA = dashboard_setting("summary_schema", "STAGE_PROD.DASHBOARD")
+ARTIST_DAILY_SUMMARY = f"{SUMMARY_SCHEMA}.ARTIST_DAILY_SUMMARY"
+CATALOG_SUMMARY = f"{SUMMARY_SCHEMA}.CATALOG_SUMMARY"
+
+# Cheap change token for the source tables. MAX() and COUNT(*) without
+# filters are answered from Snowflake's micro-partition metadata, so this
+# does not scan the daily fact tables.
+SOURCE_VERSION_QUERY = """
+    SELECT
+        (SELECT MAX(activity_date) FROM STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY) as streams_max_date,
+        (SELECT COUNT(*) FROM STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY) as streams_rows,
+        (SELECT MAX(activity_date) FROM STAGE_PROD.SOCIALS.ORCHARD_TIKTOK_DAILY) as tiktok_max_date,
+        (SELECT COUNT(*) FROM STAGE_PROD.SOCIALS.ORCHARD_TIKTOK_DAILY) as tiktok_rows,
+        (SELECT MAX(FILE_DATE) FROM STAGE_PROD.METADATA.ORCHARD_METADATA_DAILY) as metadata_max_file_date
+"""
+
+
+# The summary job stamps the source version it was built from; reading it
+# back is a one-row point read.
+SUMMARY_VERSION_QUERY = f"""
+    SELECT source_version, built_at
+    FROM {CATALOG_SUMMARY}
+"""
+
+
+def fetch_source_version(source: str = None) -> tuple:
+    """Change token for `source` ("raw" or "rollup"; the configured one by default)."""
+    source = SNAPSHOT_SOURCE if source is None else source
+    query = SUMMARY_VERSION_QUERY if source == "rollup" else SOURCE_VERSION_QUERY
+    row = execute_query(query, timeout=_query_timeout(), label="source_version").iloc[0]
+    return tuple(str(v) for v in row)
+
+
+# The snapshot is fetched as independent section queries that run concurrently
+# and are joined locally, so cold-load latency is the slowest query, not the sum.
+def _activity_window(days: int = SNAPSHOT_DAYS, since=None) -> str:
+    """
+    WHERE clause for the last `days` days of data, or for every day from
+    `since` (a date) on when incrementally topping up a rollup.
+    """
+    if since is not None:
+        lower = f"'{pd.Timestamp(since).date().isoformat()}'::DATE"
+    else:
+        lower = f"(SELECT(max_date.max_date) FROM max_date) - {days - 1}"
+    return f"""activity_date >= {lower}
+            AND activity_date <= (SELECT(max_date.max_date) FROM max_date)"""
+
+
+def streams_query(days: int = SNAPSHOT_DAYS, since=None) -> str:
+    return f"""
+    WITH
+
+    max_date AS (
+    SELECT
+    MAX(activity_date) as max_date
+    FROM STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY
+
+    )
+
+    SELECT
+    activity_date,
+    artist_name,
+    artist_id,
+    SUM(streams) as total_streams,
+    SUM(listeners) as total_listeners
+
+    FROM STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY
+        WHERE {_activity_window(days, since)}
+
+    GROUP BY ALL
+"""
+
+
+def tiktok_query(days: int = SNAPSHOT_DAYS, since=None) -> str:
+    return f"""
+    WITH
+
+    max_date AS (
+    SELECT
+    MAX(activity_date) as max_date
+    FROM STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY
+
+    )
+
+    SELECT
+    activity_date,
+    artist_id,
+    SUM(video_views) as tiktok_views,
+    SUM(creations) as tiktok_creations
+
+    FROM STAGE_PROD.SOCIALS.ORCHARD_TIKTOK_DAILY
+        WHERE {_activity_window(days, since)}
+
+    GROUP BY ALL
+"""
+
+
+def summary_streams_query(days: int = SNAPSHOT_DAYS, since=None) -> str:
+    return f"""
+    WITH
+
+    max_date AS (
+    SELECT
+    MAX(activity_date) as max_date
+    FROM {ARTIST_DAILY_SUMMARY}
+    )
+
+    SELECT
+    activity_date,
+    artist_name,
+    artist_id,
+    total_streams,
+    total_listeners
+
+    FROM {ARTIST_DAILY_SUMMARY}
+        WHERE {_activity_window(days, since)}
+"""
+
+
+def summary_tiktok_query(days: int = SNAPSHOT_DAYS, since=None) -> str:
+    return f"""
+    WITH
+
+    max_date AS (
+    SELECT
+    MAX(activity_date) as max_date
+    FROM {ARTIST_DAILY_SUMMARY}
+    )
+
+    SELECT
+    activity_date,
+    artist_id,
+    tiktok_views,
+    tiktok_creations
+
+    FROM {ARTIST_DAILY_SUMMARY}
+        WHERE {_activity_window(days, since)}
+            AND (tiktok_views > 0 OR tiktok_creations > 0)
+"""
+
+
+# Active artists are counted locally from the per-day presence in the
+# snapshot, which merges exactly over any window. The track count is the one
+# distinct count left in SQL: distinct_counts = "approx" answers it from a
+# HyperLogLog sketch (APPROX_COUNT_DISTINCT, ~1.6% error in Snowflake)
+# instead of sorting every artist/track pair of the metadata file.
+DISTINCT_COUNTS = dashboard_setting("distinct_counts", "exact")
+
+
+def catalog_query(distinct: str = DISTINCT_COUNTS) -> str:
+    if distinct not in ("exact", "approx"):
+        raise ValueError(f"distinct_counts must be 'exact' or 'approx', not {distinct!r}")
+    track = "CONCAT(artist_name,track_name)"
+    count = f"APPROX_COUNT_DISTINCT({track})" if distinct == "approx" else f"COUNT(DISTINCT {track})"
+    return f"""
+    SELECT
+    {count} as number_of_tracks
+    FROM STAGE_PROD.METADATA.ORCHARD_METADATA_DAILY
+    WHERE FILE_DATE = (SELECT MAX(FILE_DATE) FROM STAGE_PROD.METADATA.ORCHARD_METADATA_DAILY)
+"""
+
+
+CATALOG_QUERY = catalog_query()
+
+SUMMARY_CATALOG_QUERY = f"""
+    SELECT
+    number_of_tracks
+    FROM {CATALOG_SUMMARY}
+"""
+
+
+def snapshot_queries(days: int = SNAPSHOT_DAYS, since=None) -> dict:
+    """{part name: query} for the configured source, covering `days` days or every day from `since` on."""
+    if SNAPSHOT_SOURCE == "rollup":
+        return {
+            "streams": summary_streams_query(days, since),
+            "tiktok": summary_tiktok_query(days, since),
+            "catalog": SUMMARY_CATALOG_QUERY,
+        }
+    return {
+        "streams": streams_query(days, since),
+        "tiktok": tiktok_query(days, since),
+        "catalog": CATALOG_QUERY,
+    }
+
+
+SNAPSHOT_QUERIES = snapshot_queries()
+
+
+def _query_timeout() -> float:
+    return dashboard_setting("query_timeout_seconds", 120.0)
+
+
+@st.cache_resource
+def get_query_executor() -> ThreadPoolExecutor:
+    """Worker threads for concurrent section queries, one per pooled connection"""
+    return ThreadPoolExecutor(
+        max_workers=dashboard_setting("pool_size", 4),
+        thread_name_prefix="snowflake-query",
+    )
+
+
+def normalize_snapshot_part(df: pd.DataFrame) -> pd.DataFrame:
+    """Lower-case column names (Snowflake returns upper case) and parse dates."""
+    df.columns = [str(c).lower() for c in df.columns]
+    if "activity_date" in df.columns:
+        df["activity_date"] = pd.to_datetime(df["activity_date"])
+    return df
+
+
+def fetch_snapshot_part(name: str, query: str = None) -> pd.DataFrame:
+    query = SNAPSHOT_QUERIES[name] if query is None else query
+    return normalize_snapshot_part(execute_query(query, timeout=_query_timeout(), label=name))
+
+
+def submit_snapshot_parts(queries: dict = None) -> dict:
+    """Submit every section query at once (SNAPSHOT_QUERIES by default); returns {part name: Future}."""
+    executor = get_query_executor()
+    queries = SNAPSHOT_QUERIES if queries is None else queries
+    return {name: executor.submit(fetch_snapshot_part, name, query) for name, query in queries.items()}
+
+
+def compact_snapshot_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink an artist x day frame for keeping in memory: artist columns
+    become categoricals (one copy of each name) and integer-valued numeric
+    columns are downcast to the smallest integer type that holds them.
+    Already compact frames come back unchanged.
+    """
+    frame = frame.copy(deep=False)
+    for col in ("artist_name", "artist_id"):
+        if col in frame and not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = frame[col].astype("category")
+    for col in [*METRIC_COLUMNS, "number_of_tracks"]:
+        if col in frame and pd.api.types.is_numeric_dtype(frame[col]):
+            frame[col] = pd.to_numeric(frame[col], downcast="integer")
+    return frame
+
+
+def assemble_snapshot_frame(parts: dict) -> pd.DataFrame:
+    """
+    Join the section results into one row per artist per day. Only the
+    streams part is required; missing TikTok/catalog parts read as zero.
+    """
+    frame = parts["streams"]
+    tiktok = parts.get("tiktok")
+    if tiktok is not None:
+        frame = frame.merge(tiktok, on=["activity_date", "artist_id"], how="left")
+    else:
+        frame = frame.assign(tiktok_views=0, tiktok_creations=0)
+    frame[METRIC_COLUMNS] = frame[METRIC_COLUMNS].fillna(0)
+
+    catalog = parts.get("catalog")
+    frame["number_of_tracks"] = catalog["number_of_tracks"].iloc[0] if catalog is not None and len(catalog) else 0
+    return compact_snapshot_frame(frame)
+
+
+def fetch_artist_day_snapshot(queries: dict = None) -> pd.DataFrame:
+    """One row per artist per day for the last SNAPSHOT_DAYS days of data."""
+    futures = submit_snapshot_parts(queries)
+    timeout = _query_timeout() + FETCH_SLACK_SECONDS
+    return assemble_snapshot_frame({name: f.result(timeout=timeout) for name, f in futures.items()})
+
+
+class IncrementalSnapshotFetcher:
+    """
+    Refresher `fetch` that keeps an ArtistDayRing of the last `days` days
+    and only asks the warehouse for days it has not folded in yet. The first
+    call loads the whole ring. Later calls fetch from the ring's latest day
+    on: that day is fetched again so late-arriving rows replace it, and any
+    newer days advance the ring. Every `full_reload_seconds` the whole ring
+    is fetched again, since changes to older days are otherwise never seen.
+    Returns the ring as a DailyGrain rather than a frame; folding in a day
+    and handing out the grain both cost O(artists), not O(days x artists).
+    `seed()` loads the ring from a stored snapshot frame instead.
+    """
+
+    def __init__(self, days: int = SNAPSHOT_DAYS, full_reload_seconds: float = 86400.0):
+        self.days = days
+        self.full_reload_seconds = full_reload_seconds
+        self.ring = ArtistDayRing(days)
+        self._loaded_at = None
+
+    def __call__(self) -> DailyGrain:
+        full = self.ring.latest is None or time.monotonic() - self._loaded_at >= self.full_reload_seconds
+        if full:
+            queries = snapshot_queries(days=self.days)
+        else:
+            queries = snapshot_queries(since=self.ring.latest)
+        frame = fetch_artist_day_snapshot(queries)
+        with telemetry.span("rollup", full=full):
+            if full:
+                # Swap in the reloaded ring only once it is complete
+                ring = ArtistDayRing.from_frame(frame, self.days)
+                self.ring, self._loaded_at = ring, time.monotonic()
+            else:
+                self.ring.update(frame)
+            telemetry.annotate(days=frame["activity_date"].nunique(), rows=len(frame))
+        tracks = frame["number_of_tracks"].max() if len(frame) else 0
+        return self.ring.grain(tracks=tracks)
+
+    def seed(self, frame: pd.DataFrame, fetched_at: datetime) -> DailyGrain:
+        """
+        Replace the ring with a snapshot frame from the store, fetched at
+        `fetched_at`; it counts as fully reloaded then, so later calls only
+        fetch the days after it until the next full reload is due.
+        """
+        ring = ArtistDayRing.from_frame(frame, self.days)
+        age = max((datetime.now() - fetched_at).total_seconds(), 0.0)
+        self.ring, self._loaded_at = ring, time.monotonic() - age
+        tracks = frame["number_of_tracks"].max() if len(frame) else 0
+        return ring.grain(tracks=tracks)
+
+
+# --------------------------- Background refresh ---------------------------
+@dataclass(frozen=True)
+class DashboardSnapshot:
+    """
+    One refresh worth of dashboard data: the artist x day `frame`, or, when
+    it came from an incremental rollup, only its precomputed DailyGrain.
+
+    A snapshot is shared by every session in the process, never copied per
+    viewer: the grain and the per-window totals are built once, on first
+    use, and their arrays are read-only.
+    """
+
+    frame: pd.DataFrame
+    fetched_at: datetime
+    version: tuple = None
+    checked_at: datetime = None
+    precomputed: DailyGrain = None
+
+    @classmethod
+    def from_fetch(cls, result, **kwargs) -> "DashboardSnapshot":
+        """Wrap a fetch result: an artist x day frame or a DailyGrain."""
+        if isinstance(result, DailyGrain):
+            return cls(frame=None, precomputed=result, **kwargs)
+        return cls(frame=result, **kwargs)
+
+    @property
+    def updated_at(self) -> datetime:
+        """When the snapshot was last confirmed current against the source."""
+        return self.checked_at or self.fetched_at
+
+    @cached_property
+    def grain(self) -> DailyGrain:
+        """Cumulative per-artist daily sums, built once per snapshot."""
+        if self.precomputed is not None:
+            return self.precomputed
+        return DailyGrain.from_frame(self.frame)
+
+    @cached_property
+    def _window_totals(self) -> dict:
+        return {}
+
+    def window_totals(self, window) -> WindowTotals:
+        """Per-artist sums for a ComparisonWindow, computed once per snapshot and window."""
+        totals = self._window_totals.get(window.key)
+        if totals is None:
+            # Two sessions racing here both compute the same read-only result; either one is kept
+            totals = self._window_totals[window.key] = self.grain.totals(window)
+        return totals
+
+    @property
+    def data_as_of(self):
+        """Latest activity date present in the snapshot."""
+        return self.grain.as_of
+
+
+class SnapshotRefresher:
+    """
+    Stale-while-revalidate holder for the dashboard snapshot.
+    A daemon thread re-fetches every `period` seconds (+/- `jitter`), so
+    viewers are always served the last good snapshot without waiting on
+    Snowflake. Only the very first viewer after a cold start blocks.
+
+    If a `probe` is given, each refresh first asks it for a source version
+    token and only re-runs `fetch` when the token changed (or the snapshot is
+    older than `max_age` seconds).
+
+    With a `store` (see alta_store), fetched snapshots are persisted per
+    source version. A new version that another worker already fetched is
+    loaded from disk instead of the warehouse, and `load_from_store()` seeds
+    a freshly started process with the last snapshot on disk. A `fetch` with
+    a `seed(frame, fetched_at)` method (IncrementalSnapshotFetcher) is
+    seeded with every snapshot loaded from disk.
+
+    A failed refresh keeps the last good snapshot; `stale_since` then tells
+    viewers how old it is until a refresh succeeds again.
+
+    `after_refresh`, if given, is called after every background refresh
+    attempt (e.g. to save query costs).
+    """
+
+    def __init__(
+        self, fetch, period: float, jitter: float, probe=None, max_age: float = 3600.0, store=None, after_refresh=None
+    ):
+        self._fetch = fetch
+        self._probe = probe
+        self._store = store
+        self._after_refresh = after_refresh
+        self.period = period
+        self.jitter = jitter
+        self.max_age = max_age
+        self._snapshot = None
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._failing_since = None
+        self._last_error = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="snapshot-refresher", daemon=True)
+            self._thread.start()
+
+    def peek(self):
+        """Current snapshot, or None if the first fetch has not finished yet."""
+        return self._snapshot
+
+    def load_from_store(self):
+        """Serve the newest snapshot on disk (however old) until the first refresh lands."""
+        if self._store is None or self._snapshot is not None:
+            return
+        try:
+            stored = self._store.load_latest()
+        except Exception:
+            logger.warning("Could not read the snapshot store", exc_info=True)
+            return
+        if stored is not None:
+            frame, version, fetched_at = stored
+            self._snapshot = self._from_stored(frame, fetched_at=fetched_at, version=version)
+
+    @property
+    def stale_since(self):
+        """
+        While refreshes are failing: when the served snapshot was last
+        confirmed current (or when failures began, if there is none).
+        None while healthy.
+        """
+        if self._failing_since is None:
+            return None
+        snapshot = self._snapshot
+        return snapshot.updated_at if snapshot is not None else self._failing_since
+
+    def health(self) -> dict:
+        stale_since = self.stale_since
+        return {"stale_since": stale_since.isoformat() if stale_since else None, "last_error": self._last_error}
+
+    def get(self) -> DashboardSnapshot:
+        if self._snapshot is None:
+            # Cold start: wait for (or perform) the first fetch
+            with self._refresh_lock:
+                if self._snapshot is None:
+                    self._refresh_tracked()
+        return self._snapshot
+
+    def refresh(self) -> DashboardSnapshot:
+        with self._refresh_lock, telemetry.span("refresh"):
+            return self._refresh_tracked()
+
+    def _refresh_tracked(self) -> DashboardSnapshot:
+        cost_ledger.count_refresh()
+        try:
+            snapshot = self._refresh_locked()
+        except Exception as e:
+            if self._failing_since is None:
+                self._failing_since = datetime.now()
+            self._last_error = repr(e)[:300]
+            raise
+        self._failing_since = None
+        self._last_error = None
+        return snapshot
+
+    def _refresh_locked(self) -> DashboardSnapshot:
+        current = self._snapshot
+        version = self._probe() if self._probe is not None else None
+        now = datetime.now()
+
+        if (
+            current is not None
+            and version is not None
+            and version == current.version
+            and (now - current.fetched_at).total_seconds() < self.max_age
+        ):
+            # Re-checking keeps the data, so carry over the grain instead of rebuilding it
+            snapshot = replace(current, checked_at=now, precomputed=current.grain)
+            telemetry.count("cache_requests", cache="source_version", result="hit")
+        else:
+            telemetry.count("cache_requests", cache="source_version", result="miss")
+            snapshot = self._load_stored(version, now)
+            if snapshot is None:
+                snapshot = DashboardSnapshot.from_fetch(self._fetch(), fetched_at=now, version=version)
+                self._save_stored(snapshot)
+            # Build the grain and its daily trend series here, off the viewers' path
+            snapshot.grain.daily_totals
+        self._snapshot = snapshot
+        return snapshot
+
+    def _load_stored(self, version, now):
+        if self._store is None or version is None:
+            return None
+        stored = self._store.load(version)
+        if stored is None or (now - stored[1]).total_seconds() >= self.max_age:
+            telemetry.count("cache_requests", cache="disk", result="miss")
+            return None
+        telemetry.count("cache_requests", cache="disk", result="hit")
+        frame, fetched_at = stored
+        return self._from_stored(frame, fetched_at=fetched_at, version=version, checked_at=now)
+
+    def _from_stored(self, frame, **kwargs) -> DashboardSnapshot:
+        frame = compact_snapshot_frame(frame)
+        seed = getattr(self._fetch, "seed", None)
+        return DashboardSnapshot.from_fetch(frame if seed is None else seed(frame, kwargs["fetched_at"]), **kwargs)
+
+    def _save_stored(self, snapshot):
+        if self._store is None:
+            return
+        try:
+            # An incremental rollup's snapshot is only a grain; it is stored as the frame it sums
+            frame = snapshot.frame if snapshot.frame is not None else snapshot.grain.to_frame()
+            self._store.save(frame, snapshot.version, snapshot.fetched_at)
+        except Exception:
+            logger.warning("Could not persist snapshot", exc_info=True)
+
+    def _next_delay(self) -> float:
+        return max(1.0, self.period + random.uniform(-self.jitter, self.jitter))
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except CircuitOpenError as e:
+                logger.warning("Snapshot refresh skipped; keeping last good snapshot: %s", e)
+            except Exception:
+                logger.exception("Snapshot refresh failed; keeping last good snapshot")
+            if self._after_refresh is not None:
+                try:
+                    self._after_refresh()
+                except Exception:
+                    logger.exception("After-refresh hook failed")
+            time.sleep(self._next_delay())
+
+
+def snapshot_token(snapshot) -> tuple:
+    """
+    Identifies the data in a snapshot: changes when new data is fetched or
+    loaded, but not when an unchanged snapshot is merely re-checked.
+    """
+    return None if snapshot is None else (snapshot.fetched_at, snapshot.version)
+
+
+def get_snapshot_store():
+    """Disk cache under snapshot_cache_dir (default .snapshot_cache); an empty setting disables it."""
+    root = dashboard_setting("snapshot_cache_dir", ".snapshot_cache")
+    if not root:
+        return None
+    key = fingerprint(get_backend().name, *SNAPSHOT_QUERIES.values())
+    return SnapshotStore(root, key, keep=dashboard_setting("snapshot_cache_keep", 3))
+
+
+@st.cache_resource
+def get_snapshot_refresher() -> SnapshotRefresher:
+    """
+    Process-wide refresher; the TTL used to be 300s, so refresh a bit before that.
+    incremental_rollup (on by default when SNAPSHOT_DAYS exceeds two 7-day
+    windows) keeps a ring of the last rollup_days days (default
+    SNAPSHOT_DAYS) and only fetches new days on each refresh.
+    """
+    if INCREMENTAL_ROLLUP:
+        fetch = IncrementalSnapshotFetcher(
+            days=dashboard_setting("rollup_days", SNAPSHOT_DAYS),
+            full_reload_seconds=dashboard_setting("rollup_full_reload_seconds", 86400.0),
+        )
+    else:
+        fetch = fetch_artist_day_snapshot
+    refresher = SnapshotRefresher(
+        fetch,
+        period=dashboard_setting("refresh_seconds", 240.0),
+        jitter=dashboard_setting("refresh_jitter_seconds", 20.0),
+        probe=fetch_source_version,
+        max_age=dashboard_setting("max_snapshot_age_seconds", 3600.0),
+        store=get_snapshot_store(),
+        after_refresh=save_query_costs,
+    )
+    refresher.load_from_store()
+    refresher.start()
+    return refresher
+
+
+def get_overall_metrics(totals: WindowTotals) -> dict:
+    """Current vs previous window KPI totals, keyed like the old SQL columns."""
+    metrics = {}
+    for prefix, sums, active in (
+        ("curr", totals.current.sum(axis=0), totals.current_active),
+        ("prev", totals.previous.sum(axis=0), totals.previous_active),
+    ):
+        for i, col in enumerate(METRIC_COLUMNS):
+            name = col if col.startswith("total_") else f"total_{col}"
+            metrics[f"{prefix}_{name}"] = sums[i]
+        metrics[f"{prefix}_total_artists"] = active
+        metrics[f"{prefix}_total_tracks"] = totals.tracks
+    return metrics
+
+
+def get_artist_leaderboard(totals: WindowTotals, limit: int = 10, ranking: LeaderboardRanking = None) -> pd.DataFrame:
+    """
+    Top artists over the current window, by streams unless another
+    LeaderboardRanking is given. Every ranking reads the same totals, so
+    switching between them never queries the warehouse.
+    """
+    ranking = RANKINGS["streams"] if ranking is None else ranking
+    top = ranking.top(totals, limit)
+    current = totals.current[top]
+    prev_streams = totals.previous[top, METRIC_COLUMNS.index("total_streams")]
+    streams = current[:, METRIC_COLUMNS.index("total_streams")]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(prev_streams > 0, (streams - prev_streams) / prev_streams, np.nan)
+    return pd.DataFrame({
+        "artist_name": totals.artist_names[top],
+        "streams": streams,
+        "tiktok_views": current[:, METRIC_COLUMNS.index("tiktok_views")],
+        "tiktok_creations": current[:, METRIC_COLUMNS.index("tiktok_creations")],
+        "growth": growth,
+    })
+
+
+def get_overall_trend(grain: DailyGrain, metric: str, days: int = TREND_DAYS) -> np.ndarray:
+    """Daily totals of `metric` across all artists over the last `days` days, oldest first."""
+    return grain.daily_series(metric, days)
+
+
+def get_artist_trends(grain: DailyGrain, artist_names, metric: str, days: int = TREND_DAYS) -> np.ndarray:
+    """
+    (artists, days) daily `metric` per artist, in `artist_names` order, for
+    the leaderboard sparklines. Sliced from the snapshot's grain, so ten
+    artists cost no more queries than one.
+    """
+    return grain.daily_series(metric, days, artist_names)
+
+
+def query_history_query(query_ids) -> str:
+    """Snowflake's scan figures for `query_ids` (this user's queries of the last 7 days)."""
+    ids = ", ".join(sql_string(query_id) for query_id in query_ids)
+    return f"""
+    SELECT
+    query_id,
+    total_elapsed_time,
+    bytes_scanned,
+    partitions_scanned,
+    partitions_total,
+    warehouse_size
+
+    FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_USER(RESULT_LIMIT => 10000))
+        WHERE query_id IN ({ids})
+"""
+
+
+def resolve_query_costs(batch: int = 500, min_interval: float = None) -> int:
+    """
+    Fill in bytes/partitions scanned and result reuse for recorded queries
+    with one QUERY_HISTORY lookup (Snowflake only; the local backend reports
+    its scan figures inline). The lookup runs on the warehouse, so it is
+    skipped unless non-probe queries are pending and none started within
+    `min_interval` seconds (default cost_history_seconds). Probes pending at
+    that point ride along. Returns how many queries were resolved.
+    """
+    if get_backend().name != "snowflake":
+        return 0
+    if not cost_ledger.pending(exclude_labels=cost_ledger.overhead_labels | PROBE_QUERY_LABELS):
+        return 0
+    if not cost_ledger.start_history_lookup(COST_HISTORY_SECONDS if min_interval is None else min_interval):
+        return 0
+    pending = cost_ledger.pending(exclude_labels=cost_ledger.overhead_labels)[-batch:]
+    history = execute_query(query_history_query(pending), timeout=_query_timeout(), label="query_history")
+    history.columns = [c.lower() for c in history.columns]
+    cost_ledger.apply_history(history.to_dict("records"), looked_up=pending)
+    return len(history)
+
+
+def save_query_costs(path: str = None):
+    """
+    Resolve pending query costs when due (see resolve_query_costs), then
+    write the ledger summary to `path` (default cost_stats_file), if any.
+    """
+    path = path or COST_STATS_FILE
+    try:
+        resolve_query_costs()
+    except Exception:
+        logger.warning("Could not look up query history; saving costs without it", exc_info=True)
+    if path:
+        cost_ledger.write(path)
+
+
+def iter_snapshot_stages():
+    """
+    Yield (ready part names, snapshot) as data becomes available.
+    Once the refresher holds a snapshot this yields it once, complete. On a
+    cold start the section queries are submitted concurrently, and a partial
+    snapshot is yielded each time one of them lands (from the streams part
+    on). Identical queries already in flight from the refresher are coalesced
+    with these by the single-flight layer.
+    """
+    snapshot = get_snapshot_refresher().peek()
+    telemetry.count("cache_requests", cache="snapshot", result="hit" if snapshot is not None else "miss")
+    if snapshot is not None:
+        yield set(SNAPSHOT_QUERIES), snapshot
+        return
+
+    futures = submit_snapshot_parts()
+    names = {future: name for name, future in futures.items()}
+    parts = {}
+    for future in as_completed(names, timeout=_query_timeout() + FETCH_SLACK_SECONDS):
+        parts[names[future]] = future.result()
+        if "streams" in parts:
+            frame = assemble_snapshot_frame(parts)
+            yield set(parts), DashboardSnapshot(frame=frame, fetched_at=datetime.now())
+
+
+@st.cache_resource
+def start_telemetry():
+    """
+    Wire process-wide telemetry once: optional JSON span log
+    (telemetry_log = "-" for stderr or a file path), optional Prometheus
+    endpoint (metrics_port), and scrape-time gauges for the query
+    single-flight group, the circuit breaker and the backend.
+    """
+    log_target = dashboard_setting("telemetry_log", "")
+    if log_target:
+        configure_json_log(log_target)
+    telemetry.register_collector("query_flight", lambda: get_query_flight().stats())
+    telemetry.register_collector("circuit", lambda: get_circuit_breaker().stats())
+    telemetry.register_collector("backend", lambda: get_backend().stats())
+    telemetry.register_collector("query_cost", cost_ledger.gauges)
+
+    port = dashboard_setting("metrics_port", 0)
+    if port:
+        try:
+            serve_metrics(port)
+        except OSError:
+            logger.exception("Could not start metrics endpoint on port %s", port)
+    return telemetry
@@ -0,0 +1,415 @@
+"""
+Lightweight TV kiosk: one static page plus a small JSON snapshot.
+
+    python alta_kiosk.py --port 8502
+    # on the TV: http://host:8502/?token=<tv_token>&window=28d&board=growth
+
+The page is served once. Its script then polls /snapshot.json and updates
+the cards and leaderboard in place, with no Streamlit session, no script
+reruns and no iframe reloads. Polling starts every kiosk_poll_seconds and
+doubles while nothing changes, up to kiosk_max_poll_seconds. Each response carries an ETag derived from the
+snapshot's data, its stale badge and the window. A poll that presents the
+current ETag gets an empty 304, and the JSON is serialized once per
+snapshot per window, however many screens are polling. When the snapshot
+was last confirmed current changes on every background re-check, so it
+travels in an X-Updated-At header, on 304s too, rather than in the body.
+
+The JSON holds every leaderboard ranking (or only the one pinned with
+?board=), and the page rotates between them on the wall clock every
+kiosk_rotation_seconds (default 20), without asking the server again. Trend
+sparklines arrive as small inline SVGs, already thinned to their pixel
+width, so the TV only swaps markup in.
+
+Data comes from the same process-wide refresher as the Streamlit
+dashboard (alta_data), so settings such as backend, source and windows
+apply unchanged. Access requires the dashboard's tv_token (st.secrets or
+ALTA_TV_TOKEN) as ?token=.
+"""
+import argparse
+import hmac
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import streamlit as st
+
+from alta_data import (
+    LEADERBOARD_RANKINGS,
+    dashboard_setting,
+    get_artist_leaderboard,
+    get_artist_trends,
+    get_backend,
+    get_overall_metrics,
+    get_overall_trend,
+    get_snapshot_refresher,
+    resolve_ranking,
+    resolve_window,
+    snapshot_token,
+    start_telemetry,
+)
+from alta_render import (
+    CARD_SPARKLINE,
+    CARD_TRENDS,
+    DASHBOARD_CARDS,
+    leaderboard_headers,
+    leaderboard_rows,
+    logo_data_uri,
+    metric_card_fields,
+    sparkline_svg,
+    stale_text,
+)
+from alta_store import fingerprint
+from alta_telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>ALTA MUSIC GROUP - Dashboard</title>
+<style>
+    @import url('https://fonts.cdnfonts.com/css/special-gothic');
+
+    html, body { background: #000000; margin: 0; }
+    * { font-family: 'Special Gothic', sans-serif; color: #FFFFFF; }
+    main { max-width: 1600px; margin: 0 auto; padding: 0 1rem; }
+
+    .logo-wrap { display: flex; justify-content: center; margin-bottom: -2.2rem; }
+    .logo-img { display: block; transform: translateY(-18px); }
+    h1 { font-size: 2.8rem; text-align: center; margin: 0 0 0.2rem; font-weight: 700; }
+    h2 { font-size: 1.8rem; margin: 0.5rem 0; }
+    p { font-size: 0.85rem; margin: 0 0 0.25rem; text-align: center; }
+    hr { border: 0; border-top: 1px solid #333333; margin: 2rem 0; }
+
+    .kpis { display: grid; grid-template-columns: repeat(4, 1fr); gap: 0.5rem; }
+    .kpis-secondary { display: grid; grid-template-columns: 1fr 2fr 2fr 1fr; gap: 0.5rem; }
+
+    .metric-card { text-align: center; padding: 0.15rem 0; }
+    .metric-label { font-size: 1.35rem; font-weight: 800; line-height: 1.1; opacity: 0.95; }
+    .metric-value { font-size: 3.2rem; font-weight: 900; line-height: 1.05; white-space: nowrap; }
+    .metric-delta { margin-top: 0.15rem; font-size: 1.5rem; font-weight: 900; white-space: nowrap; letter-spacing: -0.02em; }
+    .metric-delta-up { color: #19C37D; }
+    .metric-delta-down { color: #FF4D4D; }
+    .metric-delta-flat { color: #AAAAAA; }
+    .metric-trend { margin-top: 0.3rem; line-height: 0; }
+    .sparkline { display: inline-block; opacity: 0.85; }
+    .stale-badge { color: #FFB020; font-weight: 800; }
+
+    .custom-table { width: 100%; border-collapse: collapse; font-size: 1.1rem; }
+    .custom-table th { padding: 10px 15px; text-align: left; border-bottom: 2px solid #FFFFFF; font-size: 1.2rem; }
+    .custom-table td { padding: 8px 15px; border-bottom: 1px solid #333333; }
+    .rank-col { width: 50px; text-align: center; }
+</style>
+</head>
+<body>
+<main>
+__LOGO__
+<h1>ALTA MUSIC GROUP</h1>
+<p><span id="caption">Loading&hellip;</span><span id="stale" class="stale-badge"></span></p>
+<hr>
+<div class="kpis">__CARDS__</div>
+<hr>
+<div class="kpis-secondary">__SECONDARY_CARDS__</div>
+<hr style="margin: 0.5rem 0;">
+<h2 id="board-title">Top Artists</h2>
+<table class="custom-table">
+<thead><tr id="board-head"><th class="rank-col">#</th><th>Artist</th><th></th><th></th><th>Trend</th></tr></thead>
+<tbody id="board">__ROWS__</tbody>
+</table>
+</main>
+<script>
+(function () {
+    // Poll quickly after a change, then back off while the data stays the same
+    var POLL_MS = __POLL_MS__, MAX_POLL_MS = __MAX_POLL_MS__, ROTATION_MS = __ROTATION_MS__;
+    var delay = POLL_MS;
+    var etag = null;
+    var boards = [], windowLabel = "";
+
+    function showBoard() {
+        if (!boards.length) { return; }
+        var turn = ROTATION_MS > 0 ? Math.floor(Date.now() / ROTATION_MS) : 0;
+        var board = boards[turn % boards.length];
+        document.getElementById("board-title").textContent = "Top Artists by " + board.label + " (" + windowLabel + ")";
+        var heads = document.getElementById("board-head").cells;
+        heads[2].textContent = board.headers[0];
+        heads[3].textContent = board.headers[1];
+        var rows = document.getElementById("board").rows;
+        for (var i = 0; i < rows.length; i++) {
+            var row = board.rows[i];
+            var cells = rows[i].cells;
+            cells[1].textContent = row ? row.artist_name : "";
+            cells[2].textContent = row ? row.values[0] : "";
+            cells[3].textContent = row ? row.values[1] : "";
+            cells[4].innerHTML = row && row.trend ? row.trend : "";
+        }
+    }
+
+    function rotate() {
+        showBoard();
+        // Turn on the wall-clock boundary, so every screen shows the same ranking
+        setTimeout(rotate, ROTATION_MS - Date.now() % ROTATION_MS + 50);
+    }
+
+    var caption = "";
+
+    function showUpdated(res) {
+        var updated = res.headers.get("X-Updated-At");
+        if (caption && updated) {
+            document.getElementById("caption").textContent = caption + " \\u2022 Updated: " + updated;
+        }
+    }
+
+    function apply(data) {
+        caption = data.label + " \\u2022 Data as of " + data.data_as_of;
+        document.getElementById("caption").textContent = caption;
+        var badge = document.getElementById("stale");
+        badge.textContent = data.stale ? " \\u2022 " + data.stale : "";
+        data.cards.forEach(function (card) {
+            var el = document.getElementById(card.id);
+            if (!el) { return; }
+            el.querySelector(".metric-value").textContent = card.value;
+            var delta = el.querySelector(".metric-delta");
+            delta.textContent = card.delta || "";
+            delta.className = "metric-delta" + (card.delta_class ? " " + card.delta_class : "");
+            var trend = el.querySelector(".metric-trend");
+            if (trend) { trend.innerHTML = card.trend || ""; }
+        });
+        boards = data.leaderboards;
+        windowLabel = data.label;
+        showBoard();
+    }
+
+    function poll() {
+        var headers = etag ? { "If-None-Match": etag } : {};
+        fetch("snapshot.json" + location.search, { headers: headers, cache: "no-store" })
+            .then(function (res) {
+                if (res.status === 200 || res.status === 304) { showUpdated(res); }
+                if (res.status === 200) {
+                    etag = res.headers.get("ETag");
+                    delay = POLL_MS;
+                    return res.json().then(apply);
+                }
+                if (res.status !== 304) { throw new Error(res.status); }
+                delay = Math.min(delay * 2, MAX_POLL_MS);
+            })
+            .catch(function () { delay = Math.min(delay * 2, MAX_POLL_MS); })
+            .then(function () { setTimeout(poll, delay); });
+    }
+    poll();
+    if (ROTATION_MS > 0) { rotate(); }
+})();
+</script>
+</body>
+</html>
+"""
+
+
+def _card_id(label: str) -> str:
+    return "card-" + label.lower().replace(" ", "-")
+
+
+def snapshot_payload(snapshot, window, stale_since=None, rankings=None) -> dict:
+    """Display-ready cards and leaderboards (LEADERBOARD_RANKINGS by default) for one snapshot and ComparisonWindow."""
+    totals = snapshot.window_totals(window)
+    metrics = get_overall_metrics(totals)
+    grain = snapshot.grain
+    data_as_of = snapshot.data_as_of
+    return {
+        "window": window.key,
+        "label": window.label,
+        "data_as_of": data_as_of.strftime('%B %d, %Y') if pd.notna(data_as_of) else "n/a",
+        "stale": stale_text(stale_since),
+        "cards": [
+            {
+                "id": _card_id(label),
+                "label": label,
+                **metric_card_fields(metrics[curr], metrics[prev] if prev else None, show_delta=prev is not None),
+                "trend": sparkline_svg(get_overall_trend(grain, CARD_TRENDS[label]), *CARD_SPARKLINE)
+                if label in CARD_TRENDS else None,
+            }
+            for label, curr, prev in DASHBOARD_CARDS
+        ],
+        "leaderboards": [
+            {
+                "key": ranking.key,
+                "label": ranking.label,
+                "headers": leaderboard_headers(ranking.key),
+                "rows": _board_rows(grain, totals, ranking),
+            }
+            for ranking in (LEADERBOARD_RANKINGS if rankings is None else rankings)
+        ],
+    }
+
+
+def _board_rows(grain, totals, ranking) -> list:
+    artists = get_artist_leaderboard(totals, ranking=ranking)
+    trends = get_artist_trends(grain, artists["artist_name"], ranking.metric)
+    return leaderboard_rows(artists, ranking=ranking.key, trends=trends)
+
+
+class _PayloadCache:
+    """Serialized payload per window and ranking set, rebuilt only when the snapshot's data or its staleness changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, snapshot, window, stale_since=None, rankings=None) -> tuple:
+        rankings = LEADERBOARD_RANKINGS if rankings is None else rankings
+        key = (window.key, *(r.key for r in rankings))
+        with self._lock:
+            entry = self._entries.get(key)
+            token = snapshot_token(snapshot)
+            if entry is None or entry[0] != token or entry[1] != stale_since:
+                etag = '"{}"'.format(fingerprint(*token, stale_since, *key))
+                payload = snapshot_payload(snapshot, window, stale_since, rankings)
+                body = json.dumps({"etag": etag, **payload}, default=str).encode()
+                entry = self._entries[key] = (token, stale_since, etag, body)
+            return entry[2], entry[3]
+
+
+def kiosk_page(poll_seconds: float, max_poll_seconds: float, rotation_seconds: float = 0.0) -> bytes:
+    logo = logo_data_uri()
+    logo_html = f'<div class="logo-wrap"><img class="logo-img" src="{logo}" width="160" /></div>' if logo else ""
+    trend_slot = '<div class="metric-trend"></div>'
+    cards = [
+        f'<div class="metric-card" id="{_card_id(label)}"><div class="metric-label">{label}</div>'
+        f'<div class="metric-value">&nbsp;</div><div class="metric-delta"></div>'
+        f'{trend_slot if label in CARD_TRENDS else ""}</div>'
+        for label, _, _ in DASHBOARD_CARDS
+    ]
+    # Same layout as the dashboard: four KPIs, then the two counts centered between spacers
+    secondary = ["<div></div>", *cards[4:], "<div></div>"]
+    rows = "".join(
+        f'<tr><td class="rank-col">{rank}</td><td></td><td></td><td></td><td></td></tr>' for rank in range(1, 11)
+    )
+    return (
+        _PAGE.replace("__LOGO__", logo_html)
+        .replace("__CARDS__", "".join(cards[:4]))
+        .replace("__SECONDARY_CARDS__", "".join(secondary))
+        .replace("__ROWS__", rows)
+        .replace("__POLL_MS__", str(int(poll_seconds * 1000)))
+        .replace("__MAX_POLL_MS__", str(int(max(poll_seconds, max_poll_seconds) * 1000)))
+        .replace("__ROTATION_MS__", str(int(max(rotation_seconds, 0) * 1000)))
+        .encode()
+    )
+
+
+class KioskServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, token: str, poll_seconds: float, max_poll_seconds: float, rotation_seconds: float = 0.0):
+        super().__init__(address, _KioskHandler)
+        self.token = token
+        self.page = kiosk_page(poll_seconds, max_poll_seconds, rotation_seconds)
+        self.payloads = _PayloadCache()
+
+
+# Telemetry endpoint label per path; the path comes from the client, so
+# anything else is counted as "other" rather than as a new series.
+_ENDPOINTS = {"/": "/", "/index.html": "/", "/snapshot.json": "/snapshot.json", "/healthz": "/healthz"}
+
+
+class _KioskHandler(BaseHTTPRequestHandler):
+    server_version = "AltaKiosk"
+
+    def do_GET(self):
+        self._status = None
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/healthz":
+            self._send(200, b"ok", "text/plain")
+        elif not hmac.compare_digest(query.get("token", "").encode(), self.server.token.encode()):
+            self._send(403, b"forbidden", "text/plain")
+        elif url.path in ("/", "/index.html"):
+            self._send(200, self.server.page, "text/html; charset=utf-8")
+        elif url.path == "/snapshot.json":
+            self._send_snapshot(query)
+        else:
+            self._send(404, b"not found", "text/plain")
+        telemetry.count("kiosk_requests", endpoint=_ENDPOINTS.get(url.path, "other"), status=str(self._status))
+
+    def _send_snapshot(self, query):
+        try:
+            refresher = get_snapshot_refresher()
+            snapshot = refresher.get()
+            etag, body = self.server.payloads.get(
+                snapshot, resolve_window(query.get("window")), refresher.stale_since, _rankings(query.get("board"))
+            )
+        except Exception:
+            logger.exception("Kiosk snapshot failed")
+            self._send(503, b'{"error": "snapshot unavailable"}', "application/json")
+            return
+        updated = snapshot.updated_at.strftime('%B %d, %Y at %I:%M %p')
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", None, etag=etag, updated=updated)
+        else:
+            self._send(200, body, "application/json", etag=etag, updated=updated)
+
+    def _send(self, status, body, ctype, etag=None, updated=None):
+        self._status = status
+        self.send_response(status)
+        if ctype:
+            self.send_header("Content-Type", ctype)
+        if etag:
+            self.send_header("ETag", etag)
+        if updated:
+            self.send_header("X-Updated-At", updated)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _rankings(key: str = None) -> list:
+    """Just the ranking pinned with ?board=, or all of them for the page to rotate through."""
+    if key and key.lower() in {r.key for r in LEADERBOARD_RANKINGS}:
+        return [resolve_ranking(key)]
+    return LEADERBOARD_RANKINGS
+
+
+def _tv_token() -> str:
+    token = os.environ.get("ALTA_TV_TOKEN")
+    if token is None:
+        try:
+            token = st.secrets.get("tv_token", "")
+        except FileNotFoundError:
+            token = ""
+    return token
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard as a static kiosk page plus a JSON snapshot")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    token = _tv_token()
+    if not token:
+        parser.error("set tv_token in st.secrets (or ALTA_TV_TOKEN) so screens can authenticate")
+
+    start_telemetry()
+    get_backend()
+    get_snapshot_refresher()
+    server = KioskServer(
+        (args.host, args.port),
+        token,
+        poll_seconds=dashboard_setting("kiosk_poll_seconds", 15.0),
+        max_poll_seconds=dashboard_setting("kiosk_max_poll_seconds", 240.0),
+        rotation_seconds=dashboard_setting("kiosk_rotation_seconds", 20.0),
+    )
+    print(f"Kiosk serving on http://{args.host}:{args.port}/?token=...")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
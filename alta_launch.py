@@ -0,0 +1,148 @@
+"""
+Start the dashboard server with its data already warm.
+
+    python alta_launch.py                             # instead of: streamlit run alta_dashboard.py
+    python alta_launch.py --server.port 8502          # other options go to streamlit run
+    python alta_launch.py --check                     # time a cold start to first full paint, then exit
+
+`streamlit run` imports the dashboard and fetches data only once the first
+viewer connects, so the first screen after a deploy waits for:
+- the imports
+- the Snowflake login and key parsing
+- every snapshot query
+
+This launcher does that work up front:
+1. It imports the dashboard modules before the server starts.
+2. It opens the pooled connections and fetches the snapshot (grain and
+   window totals included) in a background thread while the server comes
+   up. A viewer who arrives early joins the in-flight queries rather than
+   starting its own.
+
+All of this lives in st.cache_resource, which the server's sessions
+share, so the first viewer is served from memory. The heavy optional
+imports (snowflake.connector, cryptography, pyarrow, duckdb) stay lazy and
+are paid by the backend start, here, not by a viewer.
+
+Each step is reported with its duration. The dashboard records when the
+first full page is painted (telemetry milestone first_full_paint), and
+that is reported too, measured from process start. The same numbers are
+exported as alta_startup_* gauges on the metrics endpoint.
+"""
+import time
+
+LAUNCH_STARTED = time.time()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import threading  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alta_dashboard.py")
+
+
+def _timed(report: dict, step: str, fn):
+    started = time.perf_counter()
+    result = fn()
+    report[step] = time.perf_counter() - started
+    print(f"startup: {step:<22} {report[step]:7.3f}s", file=sys.stderr)
+    return result
+
+
+def import_modules(report: dict):
+    """Import what the first page needs, timed per group."""
+    _timed(report, "import.numpy_pandas", lambda: (__import__("numpy"), __import__("pandas")))
+    _timed(report, "import.streamlit", lambda: __import__("streamlit"))
+    _timed(report, "import.dashboard", lambda: (__import__("alta_data"), __import__("alta_render")))
+
+
+def warm_up(report: dict):
+    """Connect, fetch the snapshot and build every window's totals, as the first viewer would."""
+    from alta_data import DASHBOARD_WINDOWS, get_backend, get_snapshot_refresher, start_telemetry
+
+    _timed(report, "telemetry", start_telemetry)
+    _timed(report, "backend", get_backend)
+    refresher = _timed(report, "refresher", get_snapshot_refresher)
+    snapshot = _timed(report, "snapshot", refresher.get)
+    _timed(report, "window_totals", lambda: [snapshot.window_totals(w) for w in DASHBOARD_WINDOWS])
+    report["warm_after_start"] = time.time() - LAUNCH_STARTED
+    print(f"startup: data warm {report['warm_after_start']:.2f}s after start", file=sys.stderr)
+
+
+def _warm_up_in_background(report: dict):
+    try:
+        warm_up(report)
+    except Exception as e:
+        # The first viewer retries the fetch and gets the usual error page if it still fails
+        print(f"startup: warm-up failed, viewers will fetch on demand: {e!r}", file=sys.stderr)
+
+
+def wait_for_first_paint(report: dict, timeout: float = None) -> bool:
+    from alta_telemetry import telemetry
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while "first_full_paint" not in telemetry.milestones():
+        if deadline is not None and time.monotonic() > deadline:
+            return False
+        time.sleep(0.2)
+    report["first_full_paint"] = telemetry.milestones()["first_full_paint"]
+    print(f"startup: first full paint {report['first_full_paint']:.2f}s after start", file=sys.stderr)
+    return True
+
+
+def check(report: dict, timeout: float) -> bool:
+    """Warm up, then render the page once in-process (AppTest) to measure the first full paint."""
+    from streamlit.testing.v1 import AppTest
+
+    warm_up(report)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.secrets["tv_token"] = "startup-check"
+    at.query_params["token"] = "startup-check"
+    _timed(report, "first_render", at.run)
+    if at.exception or at.error:
+        print(f"startup: page failed: {[e.value for e in [*at.exception, *at.error]]}", file=sys.stderr)
+        return False
+    return wait_for_first_paint(report, timeout=1.0)
+
+
+def _write_report(report: dict, path: str):
+    if path:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start the dashboard with the backend and snapshot warmed up")
+    parser.add_argument("--check", action="store_true", help="measure a cold start to first full paint and exit")
+    parser.add_argument("--report", help="also write the startup timings to this JSON file")
+    parser.add_argument("--timeout", type=float, default=300.0, help="--check: seconds to wait for the page")
+    args, streamlit_args = parser.parse_known_args()
+
+    from alta_telemetry import telemetry
+
+    # Measure from the launcher's start, to the sub-second, rather than the kernel's process start time
+    telemetry.started_at = LAUNCH_STARTED
+    report = {}
+    import_modules(report)
+
+    if args.check:
+        ok = check(report, args.timeout)
+        _write_report(report, args.report)
+        sys.exit(0 if ok else 1)
+
+    threading.Thread(target=_warm_up_in_background, args=(report,), name="startup-warm-up", daemon=True).start()
+
+    def _report_first_paint():
+        wait_for_first_paint(report)
+        _write_report(report, args.report)
+
+    threading.Thread(target=_report_first_paint, name="startup-report", daemon=True).start()
+
+    from streamlit.web import cli as stcli
+
+    sys.argv = ["streamlit", "run", APP_PATH, *streamlit_args]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
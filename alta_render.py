@@ -0,0 +1,240 @@
+"""
+HTML builders for the dashboard's logo, metric cards, trend sparklines and
+artist leaderboard.
+These return markup strings only; alta_dashboard hands them to Streamlit.
+The *_fields/*_rows helpers return the same display text as plain data,
+for the kiosk page (alta_kiosk) to place into its DOM.
+
+Builders are memoized: static assets once per process, cards and boards
+on their displayed text. A rerun over unchanged data therefore gets back
+byte-identical markup. Streamlit then sends large elements, such as the
+logo, to a browser that already has them as a short hash reference.
+
+Sparklines are inline SVG polylines, so no chart library or script has to
+run on the TV. Each daily series is thinned with LTTB to one point per
+SPARKLINE_PX_PER_POINT pixels before it is drawn, which caps its markup
+however many days it covers.
+"""
+import base64
+import os
+from functools import lru_cache
+from html import escape
+
+import pandas as pd
+
+from alta_rollup import lttb
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "ALTA-ICON-CIRCLE-(WHITE).png")
+
+
+@lru_cache(maxsize=1)
+def logo_data_uri() -> str:
+    """The logo PNG as a data: URI, read once per process ("" if the file is missing)."""
+    if not os.path.exists(LOGO_PATH):
+        return ""
+    with open(LOGO_PATH, "rb") as f:
+        return "data:image/png;base64," + base64.b64encode(f.read()).decode()
+
+
+@lru_cache(maxsize=1)
+def logo_html() -> str:
+    logo = logo_data_uri()
+    if not logo:
+        return ""
+    return f"""
+            <div class="logo-wrap">
+                <img class="logo-img" src="{logo}" width="160" />
+            </div>
+            """
+
+
+def _pct_change(curr: float, prev: float) -> float:
+    curr = float(curr or 0)
+    prev = float(prev or 0)
+    if prev == 0:
+        return 0.0 if curr == 0 else 1.0
+    return (curr - prev) / prev
+
+
+# (label, current metric key, previous metric key or None) in page order
+DASHBOARD_CARDS = [
+    ("Total Streams", "curr_total_streams", "prev_total_streams"),
+    ("Listeners", "curr_total_listeners", "prev_total_listeners"),
+    ("TikTok Views", "curr_total_tiktok_views", "prev_total_tiktok_views"),
+    ("TikTok Creations", "curr_total_tiktok_creations", "prev_total_tiktok_creations"),
+    ("Active Artists", "curr_total_artists", None),
+    ("Active Tracks", "curr_total_tracks", None),
+]
+
+
+# Cards that show a daily trend under their number: label -> grain metric column
+CARD_TRENDS = {
+    "Total Streams": "total_streams",
+    "Listeners": "total_listeners",
+    "TikTok Views": "tiktok_views",
+}
+
+# Sparkline sizes in CSS pixels: (width, height)
+CARD_SPARKLINE = (240, 40)
+ROW_SPARKLINE = (96, 22)
+SPARKLINE_PX_PER_POINT = 2
+
+
+def sparkline_svg(values, width: int, height: int) -> str:
+    """Inline SVG line of a daily series, scaled to its own min/max ("" for fewer than two days)."""
+    return _sparkline(tuple(values.tolist() if hasattr(values, "tolist") else values), width, height)
+
+
+@lru_cache(maxsize=512)
+def _sparkline(values: tuple, width: int, height: int) -> str:
+    if len(values) < 2:
+        return ""
+    xs, ys = lttb(values, max(3, width // SPARKLINE_PX_PER_POINT))
+    lo, hi = ys.min(), ys.max()
+    span = hi - lo
+    x_scale = (width - 2) / (len(values) - 1)
+    # Flat series draw through the middle; otherwise the peak touches the top
+    heights = (ys - lo) / span * (height - 2) if span > 0 else [(height - 2) / 2] * len(ys)
+    points = " ".join(f"{1 + x * x_scale:.0f},{height - 1 - h:.1f}" for x, h in zip(xs, heights))
+    return (
+        f'<svg class="sparkline" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+        f'<polyline fill="none" stroke="currentColor" stroke-width="1.5" points="{points}"/></svg>'
+    )
+
+
+def metric_card_fields(curr_value, prev_value=None, is_int=True, show_delta=True) -> dict:
+    """Display text for a metric card: value, and delta text/CSS class (None without a delta)."""
+    curr = float(curr_value or 0)
+    prev = float(prev_value or 0) if prev_value is not None else None
+
+    value_txt = f"{int(curr):,}" if is_int else f"{curr:.1f}"
+
+    if (not show_delta) or (prev is None):
+        return {"value": value_txt, "delta": None, "delta_class": None}
+
+    pct = _pct_change(curr, prev)
+
+    if curr > prev:
+        arrow = "▲"
+        cls = "metric-delta-up"
+    elif curr < prev:
+        arrow = "▼"
+        cls = "metric-delta-down"
+    else:
+        arrow = "—"
+        cls = "metric-delta-flat"
+
+    sign = "+" if pct > 0 else ""
+    pct_txt = f"{sign}{pct*100:.0f}%"
+    return {"value": value_txt, "delta": f"{arrow} {pct_txt}", "delta_class": cls}
+
+
+@lru_cache(maxsize=256)
+def metric_card_html(label: str, curr_value, prev_value=None, is_int=True, show_delta=True, trend: str = "") -> str:
+    """A metric card; `trend` is optional sparkline markup (see sparkline_svg) shown under the number."""
+    fields = metric_card_fields(curr_value, prev_value, is_int=is_int, show_delta=show_delta)
+    trend_html = f'<div class="metric-trend">{trend}</div>' if trend else ""
+
+    if fields["delta"] is None:
+        return f"""
+            <div class="metric-card">
+              <div class="metric-label">{label}</div>
+              <div class="metric-value">{fields["value"]}</div>{trend_html}
+            </div>
+            """
+
+    return f"""
+        <div class="metric-card">
+          <div class="metric-label">{label}</div>
+          <div class="metric-value">{fields["value"]}</div>
+          <div class="metric-delta {fields["delta_class"]}">{fields["delta"]}</div>{trend_html}
+        </div>
+        """
+
+
+def stale_text(stale_since):
+    """Badge text for a snapshot that could not be refreshed, or None while data is current."""
+    if stale_since is None:
+        return None
+    return f"⚠ Stale since {stale_since.strftime('%B %d at %I:%M %p')}"
+
+
+# (header, leaderboard column) value columns shown for each ranking key, ranked metric first
+LEADERBOARD_COLUMNS = {
+    "streams": [("Streams", "streams"), ("TikTok Views", "tiktok_views")],
+    "tiktok_views": [("TikTok Views", "tiktok_views"), ("Streams", "streams")],
+    "tiktok_creations": [("TikTok Creations", "tiktok_creations"), ("TikTok Views", "tiktok_views")],
+    "growth": [("Growth", "growth"), ("Streams", "streams")],
+}
+
+
+def _leaderboard_value(column: str, value) -> str:
+    if column == "growth":
+        if pd.isna(value):
+            return "n/a"
+        sign = "+" if value > 0 else ""
+        return f"{sign}{value*100:.0f}%"
+    return f"{int(value):,}"
+
+
+def leaderboard_headers(ranking: str = "streams") -> list:
+    return [header for header, _ in LEADERBOARD_COLUMNS[ranking]]
+
+
+def leaderboard_rows(artists: pd.DataFrame, limit: int = 10, ranking: str = "streams", trends=None) -> list:
+    """
+    Display text for the top `limit` leaderboard rows, with the value
+    columns for `ranking`. `trends`, if given, holds each row's daily
+    series, in row order; rows then also carry a "trend" sparkline.
+    """
+    top = artists.head(limit)
+    names = top["artist_name"].astype(str).tolist()
+    columns = [
+        [_leaderboard_value(column, value) for value in top[column].tolist()]
+        for _, column in LEADERBOARD_COLUMNS[ranking]
+    ]
+    rows = [
+        {"rank": idx + 1, "artist_name": name, "values": [values[idx] for values in columns]}
+        for idx, name in enumerate(names)
+    ]
+    if trends is not None:
+        for row, series in zip(rows, trends):
+            row["trend"] = sparkline_svg(series, *ROW_SPARKLINE)
+    return rows
+
+
+@lru_cache(maxsize=64)
+def _leaderboard_table(headers: tuple, rows: tuple) -> str:
+    head = "".join(f"<th>{header}</th>" for header in headers)
+    body = "".join(
+        f'<tr><td class="rank-col">{rank}</td><td>{escape(name)}</td>'
+        + "".join(f"<td>{value}</td>" for value in values)
+        + "</tr>"
+        for rank, name, *values in rows
+    )
+    return (
+        f'<table class="custom-table"><thead><tr><th class="rank-col">#</th><th>Artist</th>{head}</tr></thead>'
+        f"<tbody>{body}</tbody></table>"
+    )
+
+
+def leaderboard_table_html(artists: pd.DataFrame, ranking: str = "streams", trends=None) -> str:
+    """
+    The top-artists <table> for a ranking key, styled by the page's
+    .custom-table rules, with a Trend column when `trends` is given (see
+    leaderboard_rows). Memoized on the displayed text, so an unchanged
+    board returns the identical string without rebuilding it.
+    """
+    rows = tuple(
+        (row["rank"], row["artist_name"], *row["values"], *([row["trend"]] if "trend" in row else []))
+        for row in leaderboard_rows(artists, ranking=ranking, trends=trends)
+    )
+    headers = leaderboard_headers(ranking) + (["Trend"] if trends is not None else [])
+    return _leaderboard_table(tuple(headers), rows)
+
+
+def clear_render_caches():
+    """Forget memoized cards, sparklines and boards (the logo stays), e.g. to time a cold render."""
+    metric_card_html.cache_clear()
+    _sparkline.cache_clear()
+    _leaderboard_table.cache_clear()
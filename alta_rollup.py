@@ -0,0 +1,499 @@
+"""
+Per-artist window rollups for the KPI cards and leaderboard.
+
+`WindowTotals` is the per-artist summary of a current and a previous
+period. The cards and the leaderboard are computed from it.
+`ComparisonWindow` defines those periods (last 7/28/90 days, month to date,
+year to date), and `LeaderboardRanking` the orders the leaderboard can
+show them in. `DailyGrain` holds cumulative per-artist daily sums, so
+totals for any window are computed without going back to the warehouse.
+
+The grain also yields daily series, for the whole roster or per artist,
+behind the trend sparklines. `lttb` thins a series to the points a chart
+can actually show.
+
+`ArtistDayRing` keeps the last `days` days of per-artist aggregates as
+cumulative NumPy rows. When a new day arrives, it appends one row and drops
+the oldest day in O(artists), so a refresh only needs that day's rows from
+the warehouse, however long the ring is, and hands out its DailyGrain
+without rebuilding it.
+"""
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+METRIC_COLUMNS = ["total_streams", "total_listeners", "tiktok_views", "tiktok_creations"]
+# Rows with a NULL artist_name are summed under this name, as GROUP BY artist_name
+# kept them in one group, but not counted as an active artist (COUNT(DISTINCT) skips NULL)
+UNNAMED_ARTIST = "(no artist name)"
+
+
+def label_artists(names: pd.Series) -> pd.Series:
+    """`names` with NULLs replaced by UNNAMED_ARTIST; unchanged when there are none."""
+    if not names.isna().any():
+        return names
+    if isinstance(names.dtype, pd.CategoricalDtype) and UNNAMED_ARTIST not in names.cat.categories:
+        names = names.cat.add_categories([UNNAMED_ARTIST])
+    return names.fillna(UNNAMED_ARTIST)
+
+
+def _bincount_sum(codes: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """Per-code column sums of a (rows, metrics) array, as int64 (artists, metrics)."""
+    out = np.zeros((n, values.shape[1]), dtype=np.int64)
+    for m in range(values.shape[1]):
+        out[:, m] = np.rint(np.bincount(codes, weights=values[:, m], minlength=n))
+    return out
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+@dataclass(frozen=True)
+class WindowTotals:
+    artist_names: np.ndarray
+    current: np.ndarray
+    previous: np.ndarray
+    current_days: np.ndarray
+    previous_days: np.ndarray
+    as_of: pd.Timestamp
+    tracks: int = 0
+
+    @property
+    def current_mask(self) -> np.ndarray:
+        """Artists with at least one row in the current window."""
+        return self.current_days > 0
+
+    @property
+    def current_active(self) -> int:
+        return self._active(self.current_days)
+
+    @property
+    def previous_active(self) -> int:
+        return self._active(self.previous_days)
+
+    def _active(self, days: np.ndarray) -> int:
+        unnamed = np.flatnonzero(self.artist_names == UNNAMED_ARTIST)
+        return int(np.count_nonzero(days) - np.count_nonzero(days[unnamed]))
+
+
+@dataclass(frozen=True)
+class ComparisonWindow:
+    key: str
+    label: str
+    days: int = None
+
+    def ranges(self, as_of: pd.Timestamp) -> tuple:
+        """((current start, end), (previous start, end)) as inclusive dates ending at `as_of`."""
+        as_of = pd.Timestamp(as_of).normalize()
+        if self.days is not None:
+            span = pd.Timedelta(days=self.days)
+            return (as_of - span + pd.Timedelta(days=1), as_of), (as_of - 2 * span + pd.Timedelta(days=1), as_of - span)
+        if self.key == "mtd":
+            start = as_of.replace(day=1)
+            prev_start = start - pd.offsets.MonthBegin(1)
+            prev_end = min(prev_start + pd.Timedelta(days=as_of.day - 1), start - pd.Timedelta(days=1))
+            return (start, as_of), (prev_start, prev_end)
+        if self.key == "ytd":
+            start = as_of.replace(month=1, day=1)
+            # Same calendar date a year earlier (Feb 29 maps to Feb 28)
+            return (start, as_of), (start.replace(year=start.year - 1), as_of - pd.DateOffset(years=1))
+        raise ValueError(f"unknown window {self.key!r}")
+
+    @property
+    def history_days(self) -> int:
+        """Days of history that always cover both the current and previous period."""
+        if self.days is not None:
+            return 2 * self.days
+        return {"mtd": 62, "ytd": 732}[self.key]
+
+
+WINDOWS = {
+    w.key: w
+    for w in (
+        ComparisonWindow("7d", "Last 7 Days", 7),
+        ComparisonWindow("28d", "Last 28 Days", 28),
+        ComparisonWindow("90d", "Last 90 Days", 90),
+        ComparisonWindow("mtd", "Month to Date"),
+        ComparisonWindow("ytd", "Year to Date"),
+    )
+}
+
+
+def parse_windows(text: str) -> list:
+    """ComparisonWindows for a comma separated list of keys such as "7d,28d,mtd"."""
+    keys = [k.strip().lower() for k in text.split(",") if k.strip()]
+    unknown = [k for k in keys if k not in WINDOWS]
+    if unknown or not keys:
+        raise ValueError(f"unknown comparison windows {unknown or text!r}; choose from {', '.join(WINDOWS)}")
+    return [WINDOWS[k] for k in keys]
+
+
+@dataclass(frozen=True)
+class LeaderboardRanking:
+    """
+    Leaderboard order: by a metric over the current period, or, with
+    `growth`, by its change against the previous period (week over week for
+    the 7-day window). Growth only ranks artists with at least
+    `min_previous` in the previous period, so tiny bases do not top the list.
+    """
+
+    key: str
+    label: str
+    metric: str
+    growth: bool = False
+    min_previous: int = 0
+
+    def top(self, totals: WindowTotals, limit: int = 10) -> np.ndarray:
+        """Indices of the top `limit` artists in `totals`, best first."""
+        m = METRIC_COLUMNS.index(self.metric)
+        current = totals.current[:, m]
+        if self.growth:
+            previous = totals.previous[:, m]
+            candidates = np.flatnonzero(totals.current_mask & (previous >= max(self.min_previous, 1)))
+            scores = (current[candidates] - previous[candidates]) / previous[candidates]
+        else:
+            # Only artists active in the current window are ranked, as when grouping the frame
+            candidates = np.flatnonzero(totals.current_mask)
+            scores = current[candidates]
+        if len(candidates) > limit:
+            keep = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[keep], scores[keep]
+        return candidates[np.argsort(-scores, kind="stable")]
+
+
+RANKINGS = {
+    r.key: r
+    for r in (
+        LeaderboardRanking("streams", "Streams", "total_streams"),
+        LeaderboardRanking("tiktok_views", "TikTok Views", "tiktok_views"),
+        LeaderboardRanking("tiktok_creations", "TikTok Creations", "tiktok_creations"),
+        LeaderboardRanking("growth", "Streams Growth", "total_streams", growth=True, min_previous=1000),
+    )
+}
+
+
+def parse_rankings(text: str) -> list:
+    """LeaderboardRankings for a comma separated list of keys such as "streams,growth"."""
+    keys = [k.strip().lower() for k in text.split(",") if k.strip()]
+    unknown = [k for k in keys if k not in RANKINGS]
+    if unknown or not keys:
+        raise ValueError(f"unknown leaderboard rankings {unknown or text!r}; choose from {', '.join(RANKINGS)}")
+    return [RANKINGS[k] for k in keys]
+
+
+@dataclass(frozen=True)
+class DailyGrain:
+    """
+    Dense artist x day cube of cumulative sums. Any date range is two
+    slices apart, so totals for any window cost O(artists) once it is built.
+    Building it costs O(days x artists) memory: (days + 1) x artists x
+    metrics int64 for the sums, plus a presence-count plane in the smallest
+    integer type that fits the day count. The arrays are read-only, so one
+    grain can be shared by every session in the process.
+
+    `rows` maps day boundaries to rows of the cubes: rows[k] holds the sums
+    before day k. It is the identity for a grain built here, while an
+    ArtistDayRing hands out grains over its append-only buffer of rows
+    instead of copying them. `cum_totals`, if given, is the (rows, metrics)
+    roster-wide sum of `cum_values`.
+    """
+
+    artist_names: np.ndarray
+    first_date: pd.Timestamp
+    cum_values: np.ndarray
+    cum_present: np.ndarray
+    tracks: int = 0
+    rows: np.ndarray = None
+    cum_totals: np.ndarray = None
+
+    def __post_init__(self):
+        if self.rows is None:
+            object.__setattr__(self, "rows", _read_only(np.arange(self.cum_values.shape[0])))
+
+    @property
+    def n_days(self) -> int:
+        return len(self.rows) - 1
+
+    @property
+    def as_of(self) -> pd.Timestamp:
+        if self.n_days == 0:
+            return pd.NaT
+        return self.first_date + pd.Timedelta(days=self.n_days - 1)
+
+    @classmethod
+    def from_cube(cls, artist_names, first_date, values: np.ndarray, present: np.ndarray, tracks: int = 0) -> "DailyGrain":
+        """From per-day (days, artists, metrics) values and (days, artists) presence, oldest day first."""
+        days, artists = present.shape
+        cum_values = np.zeros((days + 1, artists, len(METRIC_COLUMNS)), dtype=np.int64)
+        np.cumsum(values, axis=0, out=cum_values[1:])
+        cum_present = np.zeros((days + 1, artists), dtype=np.min_scalar_type(-days - 1))
+        np.cumsum(present, axis=0, out=cum_present[1:])
+        return cls(
+            artist_names=_read_only(np.array(artist_names, dtype=object)),
+            first_date=pd.Timestamp(first_date),
+            cum_values=_read_only(cum_values),
+            cum_present=_read_only(cum_present),
+            tracks=int(tracks or 0),
+        )
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "DailyGrain":
+        """From an artist x day frame; days without rows count as zero."""
+        codes, names = pd.factorize(label_artists(frame["artist_name"]), sort=False)
+        n = len(names)
+        if not len(frame):
+            empty = np.zeros((0, n), dtype=bool)
+            return cls.from_cube(names, pd.NaT, np.zeros((0, n, len(METRIC_COLUMNS)), dtype=np.int64), empty)
+        first = frame["activity_date"].min()
+        day = (frame["activity_date"] - first).dt.days.to_numpy()
+        days = int(day.max()) + 1
+        flat = day * n + codes
+        values = _bincount_sum(flat, frame[METRIC_COLUMNS].to_numpy(dtype=np.float64), days * n)
+        present = np.bincount(flat, minlength=days * n).reshape(days, n) > 0
+        tracks = frame["number_of_tracks"].max() if "number_of_tracks" in frame else 0
+        return cls.from_cube(names, first, values.reshape(days, n, -1), present, tracks)
+
+    def to_frame(self) -> pd.DataFrame:
+        """The artist x day frame this grain sums: one row per artist per day with data."""
+        days = []
+        for d in range(self.n_days):
+            lo, hi = self.rows[d], self.rows[d + 1]
+            cols = np.flatnonzero(self.cum_present[hi] != self.cum_present[lo])
+            day = pd.DataFrame(self.cum_values[hi, cols] - self.cum_values[lo, cols], columns=METRIC_COLUMNS)
+            day.insert(0, "artist_name", self.artist_names[cols])
+            day.insert(0, "activity_date", self.first_date + pd.Timedelta(days=d))
+            days.append(day)
+        if not days:
+            return pd.DataFrame(columns=["activity_date", "artist_name", *METRIC_COLUMNS, "number_of_tracks"])
+        return pd.concat(days, ignore_index=True).assign(number_of_tracks=self.tracks)
+
+    def totals(self, window: ComparisonWindow) -> WindowTotals:
+        if self.n_days == 0:
+            n = len(self.artist_names)
+            zeros = _read_only(np.zeros((n, len(METRIC_COLUMNS)), dtype=np.int64))
+            no_days = _read_only(np.zeros(n, np.int32))
+            return WindowTotals(self.artist_names, zeros, zeros, no_days, no_days, pd.NaT, self.tracks)
+        current, previous = window.ranges(self.as_of)
+        curr_values, curr_days = self._range(*current)
+        prev_values, prev_days = self._range(*previous)
+        return WindowTotals(
+            artist_names=self.artist_names,
+            current=curr_values,
+            previous=prev_values,
+            current_days=curr_days,
+            previous_days=prev_days,
+            as_of=self.as_of,
+            tracks=self.tracks,
+        )
+
+    @cached_property
+    def daily_totals(self) -> np.ndarray:
+        """(days, metrics) sums over every artist per day, oldest first; built once per grain."""
+        cum_totals = self.cum_totals
+        if cum_totals is None:
+            # einsum streams through the (days, artists, metrics) block about 3x faster than .sum(axis=1)
+            cum_totals = np.einsum("dam->dm", self.cum_values)
+        return _read_only(np.diff(cum_totals[self.rows], axis=0))
+
+    @cached_property
+    def _artist_index(self) -> dict:
+        return {name: i for i, name in enumerate(self.artist_names)}
+
+    def daily_series(self, metric: str, days: int, artist_names=None) -> np.ndarray:
+        """
+        The last `days` days (fewer if the grain is shorter) of `metric`: a
+        (days,) roster total, or (artists, days) for `artist_names`, in
+        their order. Artists the grain does not know read as zero.
+        """
+        m = METRIC_COLUMNS.index(metric)
+        lo = max(self.n_days - days, 0)
+        if artist_names is None:
+            return self.daily_totals[lo:, m]
+        cols = np.array([self._artist_index.get(name, -1) for name in artist_names], dtype=np.int64)
+        known = cols >= 0
+        series = np.zeros((len(cols), self.n_days - lo), dtype=np.int64)
+        cum = self.cum_values[self.rows[lo:, None], cols[known], m]
+        series[known] = np.diff(cum, axis=0).T
+        return series
+
+    def _range(self, start, end):
+        """Sums over [start, end], clipped to the days the grain covers."""
+        lo = min(max((start - self.first_date).days, 0), self.n_days)
+        hi = min(max((end - self.first_date).days + 1, lo), self.n_days)
+        hi, lo = self.rows[hi], self.rows[lo]
+        return _read_only(self.cum_values[hi] - self.cum_values[lo]), _read_only(self.cum_present[hi] - self.cum_present[lo])
+
+
+def lttb(values, points: int) -> tuple:
+    """
+    Largest-Triangle-Three-Buckets downsampling: (indices, values) of at
+    most `points` samples that keep the series' visible shape (peaks and
+    dips survive, flat stretches thin out). Shorter series come back whole.
+    """
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n), y
+    bucket = (n - 2) / (points - 2)
+    picked = np.empty(points, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        next_end = min(int((i + 2) * bucket) + 1, n)
+        # The point in this bucket forming the largest triangle with the last pick and the next bucket's mean
+        avg_x = (end + next_end - 1) / 2.0
+        avg_y = y[end:next_end].mean()
+        xs = np.arange(start, end)
+        area = np.abs((a - avg_x) * (y[start:end] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked, y[picked]
+
+
+def _room_for(n_artists: int) -> int:
+    """Buffer columns for `n_artists`, with headroom so new artists rarely force a copy."""
+    return n_artists + max(n_artists // 4, 16)
+
+
+class ArtistDayRing:
+    """
+    The last `days` days of per-artist daily sums, kept as cumulative rows
+    in an append-only buffer. Putting the newest day (or replacing it when
+    late rows arrive) appends one row, O(artists); a day with no data just
+    repeats the previous row. Replacing an older day re-appends every row
+    after it. Rows are never written twice, so `grain()` shares the buffer
+    with the grains it hands out rather than copying it. Once the buffer is
+    full, the rows still in use move to a new one, about every `days / 4`
+    appends.
+    """
+
+    def __init__(self, days: int):
+        self.days = days
+        self._slack = max(days // 4, 8)
+        self._index = {}
+        self._names = []
+        self.latest = None
+        self._reset()
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, days: int) -> "ArtistDayRing":
+        ring = cls(days)
+        ring.update(frame)
+        return ring
+
+    def update(self, frame: pd.DataFrame):
+        """Put every day present in an artist x day frame, oldest first; each day replaces what the ring held for it."""
+        for date, day in frame.groupby("activity_date", sort=True):
+            self.put_day(date, day)
+
+    def put_day(self, date, day: pd.DataFrame):
+        date = np.datetime64(pd.Timestamp(date).date(), "D")
+        if self.latest is None or date > self.latest:
+            self._advance_to(date)
+        age = int((self.latest - date).astype(int))
+        if age >= self.days:
+            return
+        held = len(self._rows) - 1
+        if age >= held:
+            # Older than any day held so far: the days in between had no data
+            self._rows[:0] = [self._rows[0]] * (age + 1 - held)
+
+        cols = self._columns(label_artists(day["artist_name"]))
+        n = len(self._names)
+        new_values = _bincount_sum(cols, day[METRIC_COLUMNS].to_numpy(dtype=np.float64), n)
+        new_present = np.zeros(n, dtype=bool)
+        new_present[cols] = True
+        self._replace(len(self._rows) - 1 - age, new_values, new_present)
+
+    def grain(self, tracks: int = 0) -> DailyGrain:
+        """The ring's days in date order as a DailyGrain, unaffected by later updates."""
+        if self.latest is None:
+            return DailyGrain.from_frame(pd.DataFrame(columns=["activity_date", "artist_name", *METRIC_COLUMNS]))
+        n = len(self._names)
+        first = pd.Timestamp(self.latest) - pd.Timedelta(days=len(self._rows) - 2)
+        return DailyGrain(
+            artist_names=_read_only(np.array(self._names, dtype=object)),
+            first_date=first,
+            cum_values=_read_only(self._cum[:, :n]),
+            cum_present=_read_only(self._cum_present[:, :n]),
+            tracks=int(tracks or 0),
+            rows=_read_only(np.array(self._rows)),
+            cum_totals=_read_only(self._cum_totals[:]),
+        )
+
+    def _reset(self):
+        """Empty buffer whose row 0 is the zero base."""
+        self._allocate(self.days + 1 + self._slack, _room_for(len(self._names)))
+        self._rows = [0]
+        self._next = 1
+
+    def _allocate(self, n_rows: int, width: int):
+        self._cum = np.zeros((n_rows, width, len(METRIC_COLUMNS)), dtype=np.int64)
+        self._cum_present = np.zeros((n_rows, width), dtype=np.min_scalar_type(-n_rows))
+        self._cum_totals = np.zeros((n_rows, len(METRIC_COLUMNS)), dtype=np.int64)
+
+    def _advance_to(self, date):
+        steps = None if self.latest is None else int((date - self.latest).astype(int))
+        if steps is None or steps >= self.days:
+            self._reset()
+            self._rows.append(0)
+        else:
+            # Days without data repeat the last row; the oldest days fall off the front
+            self._rows.extend([self._rows[-1]] * steps)
+            del self._rows[:-(self.days + 1)]
+        self.latest = date
+
+    def _replace(self, position: int, values: np.ndarray, present: np.ndarray):
+        """New values for the day ending at rows[position]; every later row moves by the same change."""
+        n = len(values)
+        appends = len(self._rows) - position
+        if self._next + appends > len(self._cum) or n > self._cum.shape[1]:
+            self._compact(n, appends)
+        cum, cum_present, cum_totals, rows = self._cum, self._cum_present, self._cum_totals, self._rows
+
+        prev = rows[position - 1]
+        new_rows = []
+        for k in range(position, len(rows)):
+            if k == position:
+                delta, present_delta, total_delta = values, present, values.sum(axis=0)
+            else:
+                delta = cum[rows[k], :n] - cum[rows[k - 1], :n]
+                present_delta = cum_present[rows[k], :n] - cum_present[rows[k - 1], :n]
+                total_delta = cum_totals[rows[k]] - cum_totals[rows[k - 1]]
+            row = self._next
+            self._next += 1
+            cum[row, :n] = cum[prev, :n] + delta
+            cum_present[row, :n] = cum_present[prev, :n] + present_delta
+            cum_totals[row] = cum_totals[prev] + total_delta
+            new_rows.append(row)
+            prev = row
+        rows[position:] = new_rows
+
+    def _compact(self, n_artists: int, appends: int):
+        """Move the rows in use to a fresh buffer, rebased to start at zero, with room for `appends` more."""
+        used = np.array(self._rows)
+        cum, cum_present, cum_totals = self._cum, self._cum_present, self._cum_totals
+        width = cum.shape[1]
+        self._allocate(
+            max(self.days + 1 + self._slack, len(used) + appends),
+            width if n_artists <= width else _room_for(n_artists),
+        )
+        self._cum[:len(used), :width] = cum[used] - cum[used[0]]
+        self._cum_present[:len(used), :width] = cum_present[used] - cum_present[used[0]]
+        self._cum_totals[:len(used)] = cum_totals[used] - cum_totals[used[0]]
+        self._rows = list(range(len(used)))
+        self._next = len(used)
+
+    def _columns(self, names: pd.Series) -> np.ndarray:
+        """Ring column per artist name, registering artists not seen before."""
+        for name in pd.unique(names):
+            if name not in self._index:
+                self._index[name] = len(self._names)
+                self._names.append(name)
+        return names.map(self._index).to_numpy(dtype=np.int64)
@@ -0,0 +1,115 @@
+"""
+On-disk snapshot cache shared across processes and restarts.
+
+Each snapshot frame is written as an uncompressed Arrow IPC (Feather v2)
+file under <root>/<fingerprint>/, one file per source data version, with
+a small JSON sidecar holding its metadata. The fingerprint hashes the
+query text and backend name, so frames produced by older SQL are never
+served. Writes go to a temporary name and are renamed into place, so
+another worker never reads a half-written file. Reads memory-map the
+Arrow file instead of parsing it.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class SnapshotStore:
+    def __init__(self, root: str, fingerprint: str, keep: int = 3):
+        self.directory = os.path.join(root, fingerprint)
+        self.keep = keep
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _key(self, version) -> str:
+        return "unversioned" if version is None else fingerprint(*version)
+
+    def save(self, frame: pd.DataFrame, version, fetched_at: datetime):
+        from pyarrow import feather
+
+        key = self._key(version)
+        data_path = os.path.join(self.directory, f"{key}.arrow")
+        meta = {"version": list(version) if version is not None else None, "fetched_at": fetched_at.isoformat()}
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            feather.write_feather(frame.reset_index(drop=True), tmp, compression="uncompressed")
+            os.replace(tmp, data_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._write_json(os.path.join(self.directory, f"{key}.json"), meta)
+        self._prune()
+
+    def load(self, version):
+        """(frame, fetched_at) for that source version, or None."""
+        return self._load_key(self._key(version))
+
+    def load_latest(self):
+        """(frame, version, fetched_at) for the most recently fetched snapshot, or None."""
+        newest = None
+        for meta_path in glob.glob(os.path.join(self.directory, "*.json")):
+            meta = self._read_json(meta_path)
+            if meta is not None and (newest is None or meta["fetched_at"] > newest[1]["fetched_at"]):
+                newest = (meta_path, meta)
+        if newest is None:
+            return None
+        key = os.path.basename(newest[0])[:-len(".json")]
+        loaded = self._load_key(key)
+        if loaded is None:
+            return None
+        version = tuple(newest[1]["version"]) if newest[1]["version"] is not None else None
+        return loaded[0], version, loaded[1]
+
+    def _load_key(self, key):
+        from pyarrow import feather
+
+        data_path = os.path.join(self.directory, f"{key}.arrow")
+        meta = self._read_json(os.path.join(self.directory, f"{key}.json"))
+        if meta is None or not os.path.exists(data_path):
+            return None
+        try:
+            table = feather.read_table(data_path, memory_map=True)
+        except Exception:
+            logger.warning("Ignoring unreadable snapshot file %s", data_path, exc_info=True)
+            return None
+        return table.to_pandas(split_blocks=True), datetime.fromisoformat(meta["fetched_at"])
+
+    def _prune(self):
+        files = sorted(glob.glob(os.path.join(self.directory, "*.arrow")), key=os.path.getmtime, reverse=True)
+        for data_path in files[self.keep:]:
+            for path in (data_path, data_path[:-len(".arrow")] + ".json"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_json(self, path, payload):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
@@ -0,0 +1,103 @@
+"""
+Materialize the dashboard's summary tables once per data load.
+
+    python alta_summary.py                 # rebuild now
+    python alta_summary.py --if-changed    # only when the source tables moved (cron friendly)
+
+Builds two small tables in summary_schema (default STAGE_PROD.DASHBOARD):
+- ARTIST_DAILY_SUMMARY: one row per artist per day for the last `--days`
+  days, with streams, listeners and TikTok totals already joined.
+- CATALOG_SUMMARY: the active track count and the source version the
+  build was made from.
+
+They are built with the dashboard's own connection and section queries
+(alta_data), so the numbers match what the dashboard computes from the raw
+tables. Each table is replaced atomically with CREATE OR REPLACE. The
+catalog table is written last, so its version stamp only changes once the
+artist table is complete. Set source = "rollup" to make the dashboard read
+these tables instead of the raw ones.
+"""
+import argparse
+import time
+
+from alta_backends import sql_string
+from alta_data import (
+    ARTIST_DAILY_SUMMARY,
+    CATALOG_QUERY,
+    CATALOG_SUMMARY,
+    SNAPSHOT_DAYS,
+    SUMMARY_SCHEMA,
+    execute_query,
+    fetch_source_version,
+    streams_query,
+    tiktok_query,
+)
+
+
+def build_statements(days: int, version: tuple) -> list:
+    """[(label, statement)] that rebuild both summary tables from the raw sources."""
+    stamp = sql_string("|".join(version))
+    return [
+        ("summary_schema", f"CREATE SCHEMA IF NOT EXISTS {SUMMARY_SCHEMA}"),
+        ("summary_artist_daily", f"""
+    CREATE OR REPLACE TABLE {ARTIST_DAILY_SUMMARY} AS
+    SELECT
+    s.activity_date,
+    s.artist_name,
+    s.artist_id,
+    s.total_streams,
+    s.total_listeners,
+    COALESCE(t.tiktok_views, 0) as tiktok_views,
+    COALESCE(t.tiktok_creations, 0) as tiktok_creations
+
+    FROM ({streams_query(days)}) s
+    LEFT JOIN ({tiktok_query(days)}) t
+        ON s.activity_date = t.activity_date AND s.artist_id = t.artist_id
+
+    ORDER BY s.activity_date, s.artist_id
+"""),
+        ("summary_catalog", f"""
+    CREATE OR REPLACE TABLE {CATALOG_SUMMARY} AS
+    SELECT
+    c.number_of_tracks,
+    {stamp} as source_version,
+    CURRENT_TIMESTAMP as built_at
+
+    FROM ({CATALOG_QUERY}) c
+"""),
+    ]
+
+
+def built_version():
+    """Source version the current summary tables were built from, or None if they do not exist yet."""
+    try:
+        return execute_query(f"SELECT source_version FROM {CATALOG_SUMMARY}", label="summary_version").iloc[0, 0]
+    except Exception:
+        return None
+
+
+def build(days: int = SNAPSHOT_DAYS, if_changed: bool = False) -> bool:
+    """Rebuild the summary tables; returns False when skipped because nothing changed."""
+    version = fetch_source_version(source="raw")
+    if if_changed and built_version() == "|".join(version):
+        return False
+    for label, statement in build_statements(days, version):
+        started = time.perf_counter()
+        execute_query(statement, label=label)
+        print(f"{label}: {time.perf_counter() - started:.2f}s")
+    rows = execute_query(f"SELECT COUNT(*) AS n FROM {ARTIST_DAILY_SUMMARY}", label="summary_rows").iloc[0, 0]
+    print(f"{ARTIST_DAILY_SUMMARY}: {rows} rows over {days} days, source version {'|'.join(version)}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize the dashboard summary tables")
+    parser.add_argument("--days", type=int, default=SNAPSHOT_DAYS, help="days of history to keep (default: what the configured windows need)")
+    parser.add_argument("--if-changed", action="store_true", help="skip the rebuild if the source tables have not changed")
+    args = parser.parse_args()
+    if not build(days=args.days, if_changed=args.if_changed):
+        print("Summary tables are up to date")
+
+
+if __name__ == "__main__":
+    main()
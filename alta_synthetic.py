@@ -0,0 +1,138 @@
+"""
+Synthetic stand-ins for the Orchard source tables.
+
+Generates DataFrames shaped like STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY,
+STAGE_PROD.SOCIALS.ORCHARD_TIKTOK_DAILY and STAGE_PROD.METADATA.ORCHARD_METADATA_DAILY
+so the dashboard can be run, profiled and load-tested without Snowflake.
+Everything is vectorized NumPy; string columns are categoricals so even
+millions of rows stay cheap to build.
+
+    python alta_synthetic.py --artists 100000 --days 365 --out local.duckdb
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+STREAMING_TABLE = "STAGE_PROD.STREAMING.ORCHARD_TRACK_ARTIST_DAILY"
+TIKTOK_TABLE = "STAGE_PROD.SOCIALS.ORCHARD_TIKTOK_DAILY"
+METADATA_TABLE = "STAGE_PROD.METADATA.ORCHARD_METADATA_DAILY"
+
+
+def generate_orchard_tables(
+    n_artists: int = 2000,
+    n_days: int = 120,
+    tracks_per_artist: int = 3,
+    tiktok_share: float = 0.35,
+    catalog_files: int = 2,
+    end_date=None,
+    seed: int = 0,
+) -> dict:
+    """
+    Build {fully qualified table name: DataFrame} for the three source tables.
+
+    Streaming rows are dense (every track, every day), so the streaming table
+    has n_artists * tracks_per_artist * n_days rows. Artist popularity is
+    log-normal with a per-artist trend and a weekly release-day bump. TikTok
+    activity covers roughly `tiktok_share` of artists on about 60% of days.
+    """
+    rng = np.random.default_rng(seed)
+    if end_date is None:
+        end_date = pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+    dates = pd.date_range(end=pd.Timestamp(end_date).normalize(), periods=n_days, freq="D")
+
+    # --- artists and tracks ---
+    artist_ids = np.arange(1, n_artists + 1, dtype=np.int64)
+    artist_names = pd.Index([f"Artist {i:07d}" for i in artist_ids])
+    popularity = rng.lognormal(mean=5.0, sigma=1.8, size=n_artists)
+    trend = rng.normal(0.0, 0.01, size=n_artists)
+
+    n_tracks = n_artists * tracks_per_artist
+    track_artist = np.repeat(np.arange(n_artists), tracks_per_artist)
+    track_no = np.tile(np.arange(1, tracks_per_artist + 1), n_artists)
+    track_names = pd.Index([f"Track {a + 1}-{t}" for a, t in zip(track_artist, track_no)])
+    isrcs = pd.Index([f"QZ{a + 1:07d}{t:03d}" for a, t in zip(track_artist, track_no)])
+    track_share = rng.gamma(1.0, size=n_tracks)
+    track_share /= np.bincount(track_artist, weights=track_share)[track_artist]
+    listener_ratio = rng.uniform(0.35, 0.75, size=n_tracks)
+
+    # --- streaming: one row per track per day ---
+    day_idx = np.repeat(np.arange(n_days, dtype=np.int32), n_tracks)
+    row_track = np.tile(np.arange(n_tracks, dtype=np.int64), n_days)
+    row_artist = track_artist[row_track]
+
+    days_from_end = day_idx - (n_days - 1)
+    weekly = np.where(dates.dayofweek.values[day_idx] == 4, 1.15, 1.0)
+    lam = popularity[row_artist] * track_share[row_track] * np.exp(trend[row_artist] * days_from_end) * weekly
+    streams = rng.poisson(lam)
+    listeners = rng.binomial(streams, listener_ratio[row_track])
+
+    streaming = pd.DataFrame({
+        "activity_date": dates.values[day_idx],
+        "artist_id": artist_ids[row_artist],
+        "artist_name": pd.Categorical.from_codes(row_artist, artist_names),
+        "track_name": pd.Categorical.from_codes(row_track, track_names),
+        "isrc": pd.Categorical.from_codes(row_track, isrcs),
+        "streams": streams,
+        "listeners": listeners,
+    })
+
+    # --- tiktok: a subset of artists, on a subset of days ---
+    on_tiktok = rng.random(n_artists) < tiktok_share
+    active = on_tiktok[row_artist] & (rng.random(len(row_track)) < 0.6)
+    t_track, t_artist, t_day = row_track[active], row_artist[active], day_idx[active]
+    views = rng.poisson(lam[active] * 4.0)
+    tiktok = pd.DataFrame({
+        "activity_date": dates.values[t_day],
+        "artist_id": artist_ids[t_artist],
+        "artist_name": pd.Categorical.from_codes(t_artist, artist_names),
+        "isrc": pd.Categorical.from_codes(t_track, isrcs),
+        "video_views": views,
+        "creations": rng.binomial(views, 0.002),
+    })
+
+    # --- metadata: daily catalog files, older files miss some tracks ---
+    frames = []
+    for k, file_date in enumerate(dates[-catalog_files:][::-1]):
+        keep = rng.random(n_tracks) >= 0.02 * k
+        codes = np.flatnonzero(keep)
+        frames.append(pd.DataFrame({
+            "file_date": file_date,
+            "artist_name": pd.Categorical.from_codes(track_artist[codes], artist_names),
+            "track_name": pd.Categorical.from_codes(codes, track_names),
+            "isrc": pd.Categorical.from_codes(codes, isrcs),
+        }))
+    metadata = pd.concat(frames, ignore_index=True)
+
+    return {
+        STREAMING_TABLE: streaming,
+        TIKTOK_TABLE: tiktok,
+        METADATA_TABLE: metadata,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a local DuckDB file with synthetic Orchard tables")
+    parser.add_argument("--artists", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--tracks-per-artist", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="DuckDB database file to create")
+    args = parser.parse_args()
+
+    from alta_backends import DuckDBBackend
+
+    backend = DuckDBBackend(
+        path=args.out,
+        n_artists=args.artists,
+        n_days=args.days,
+        tracks_per_artist=args.tracks_per_artist,
+        seed=args.seed,
+    )
+    backend.start()
+    print(backend.stats())
+    backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Timing spans and counters for the dashboard.
+
+    with telemetry.span("query", query="streams"):
+        ...
+        telemetry.annotate(query_id=cursor.sfqid, rows=len(df))
+
+Every finished span is written as one JSON line to the "alta.telemetry"
+logger and folded into a sliding window per (span, labels) series, from
+which p50/p95 are reported. `prometheus_text()` renders everything in the
+Prometheus exposition format, and `serve_metrics()` exposes it over HTTP.
+Labels are for low-cardinality series keys (query name, section, screen);
+per-call details such as query IDs go in through `annotate()` and only
+reach the JSON log. `milestone()` records one-off startup events (such as
+the first full paint) as seconds since the process started.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("alta.telemetry")
+
+QUANTILES = (0.5, 0.95)
+
+_current_span = contextvars.ContextVar("alta_current_span", default=None)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple, **extra) -> str:
+    items = list(key) + [(k, str(v)) for k, v in extra.items()]
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in items)
+    return "{" + body + "}"
+
+
+def _quantile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _process_started_at() -> float:
+    """Wall-clock time this process started (Linux, to the second); elsewhere, now."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+class Telemetry:
+    def __init__(self, window: int = 1000):
+        self.started_at = _process_started_at()
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self._window))
+        self._sums = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._counters = defaultdict(float)
+        self._collectors = {}
+        self._milestones = {}
+
+    # ---- recording ----
+    @contextmanager
+    def span(self, name: str, **labels):
+        record = {"span": name, **labels}
+        token = _current_span.set(record)
+        status = "ok"
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            status = "error"
+            record["error"] = repr(e)[:300]
+            raise
+        except BaseException:
+            # Streamlit's st.rerun()/st.stop() unwind with BaseException subclasses
+            status = "interrupted"
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            _current_span.reset(token)
+            record["status"] = status
+            record["duration_ms"] = round(duration * 1000, 3)
+            record["ts"] = time.time()
+            self._observe(name, labels, duration, status)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps(record, default=str))
+
+    def annotate(self, **attrs):
+        """Attach details to the innermost open span in this thread (JSON log only)."""
+        record = _current_span.get()
+        if record is not None:
+            record.update(attrs)
+
+    def count(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+
+    def milestone(self, name: str):
+        """Record, the first time only, how many seconds after `started_at` `name` happened."""
+        with self._lock:
+            if name in self._milestones:
+                return
+            seconds = self._milestones[name] = time.time() - self.started_at
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({"milestone": name, "seconds": round(seconds, 3)}))
+
+    def milestones(self) -> dict:
+        with self._lock:
+            return dict(self._milestones)
+
+    def register_collector(self, name: str, fn):
+        """`fn()` returns {metric: number}; evaluated at scrape time and exported as gauges."""
+        with self._lock:
+            self._collectors[name] = fn
+
+    def _observe(self, name, labels, duration, status):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._samples[key].append(duration)
+            self._sums[key] += duration
+            self._counts[key] += 1
+            if status == "error":
+                self._errors[key] += 1
+
+    # ---- reporting ----
+    def snapshot(self) -> dict:
+        with self._lock:
+            spans = []
+            for (name, key), samples in self._samples.items():
+                values = sorted(samples)
+                spans.append({
+                    "span": name,
+                    "labels": dict(key),
+                    "count": self._counts[(name, key)],
+                    "errors": self._errors[(name, key)],
+                    "sum_s": self._sums[(name, key)],
+                    **{f"p{int(q * 100)}_s": _quantile(values, q) for q in QUANTILES},
+                })
+            counters = [
+                {"counter": name, "labels": dict(key), "value": value}
+                for (name, key), value in self._counters.items()
+            ]
+            collectors = dict(self._collectors)
+            milestones = dict(self._milestones)
+        gauges = {"startup": milestones} if milestones else {}
+        for source, fn in collectors.items():
+            try:
+                gauges[source] = fn()
+            except Exception:
+                logger.warning("Telemetry collector %s failed", source, exc_info=True)
+        return {"spans": spans, "counters": counters, "gauges": gauges}
+
+    def prometheus_text(self) -> str:
+        snap = self.snapshot()
+        lines = [
+            "# HELP alta_span_seconds Duration of instrumented dashboard stages.",
+            "# TYPE alta_span_seconds summary",
+        ]
+        for s in snap["spans"]:
+            key = _label_key(dict(s["labels"], span=s["span"]))
+            for q in QUANTILES:
+                lines.append(f"alta_span_seconds{_format_labels(key, quantile=q)} {s[f'p{int(q * 100)}_s']:.6f}")
+            lines.append(f"alta_span_seconds_sum{_format_labels(key)} {s['sum_s']:.6f}")
+            lines.append(f"alta_span_seconds_count{_format_labels(key)} {s['count']}")
+        lines.append("# TYPE alta_span_errors_total counter")
+        for s in snap["spans"]:
+            key = _label_key(dict(s["labels"], span=s["span"]))
+            lines.append(f"alta_span_errors_total{_format_labels(key)} {s['errors']}")
+
+        seen = set()
+        for c in sorted(snap["counters"], key=lambda c: c["counter"]):
+            metric = f"alta_{c['counter']}_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_format_labels(_label_key(c['labels']))} {c['value']:g}")
+
+        for source, values in snap["gauges"].items():
+            for field, value in _flatten(values):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = f"alta_{source}_{field}"
+                    lines.append(f"# TYPE {metric} gauge")
+                    lines.append(f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(values: dict, prefix: str = ""):
+    for k, v in values.items():
+        if isinstance(v, dict):
+            yield from _flatten(v, f"{prefix}{k}_")
+        else:
+            yield f"{prefix}{k}", v
+
+
+# Process-wide instance shared by the dashboard, data layer and backends
+telemetry = Telemetry()
+
+
+def configure_json_log(target: str):
+    """Write span JSON lines to `target`: "-" for stderr, otherwise a file path."""
+    handler = logging.StreamHandler() if target == "-" else logging.FileHandler(target)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body, ctype = telemetry.prometheus_text().encode(), "text/plain; version=0.0.4"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body, ctype = json.dumps(telemetry.snapshot(), default=str).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,195 @@
+"""
+Benchmark the dashboard refresh pipeline on synthetic data.
+
+Each refresh stage runs against the local DuckDB backend at several data
+scales (artists x days):
+- the source-version probe
+- each section query, including the fetch into pandas
+- snapshot assembly
+- KPI, leaderboard and daily trend aggregation
+- metric-card, leaderboard and sparkline HTML
+- not part of total: window totals for every comparison window, every
+  leaderboard ranking, re-rendering unchanged data (memoized), and folding
+  one new day into an incremental ArtistDayRing and taking its grain
+
+Results are written as JSON so runs can be compared.
+
+    python -m benchmarks.bench_dashboard --scales 100x14,10000x90 --out bench.json
+    python -m benchmarks.bench_dashboard --out new.json --compare bench.json
+"""
+import argparse
+import json
+import statistics
+import sys
+
+import numpy as np
+import pandas as pd
+
+from alta_backends import DuckDBBackend
+from alta_data import (
+    SNAPSHOT_DAYS,
+    SNAPSHOT_QUERIES,
+    SOURCE_VERSION_QUERY,
+    TREND_DAYS,
+    assemble_snapshot_frame,
+    get_artist_leaderboard,
+    get_artist_trends,
+    get_overall_metrics,
+    get_overall_trend,
+    normalize_snapshot_part,
+)
+from alta_render import (
+    CARD_SPARKLINE,
+    CARD_TRENDS,
+    DASHBOARD_CARDS,
+    clear_render_caches,
+    leaderboard_table_html,
+    metric_card_html,
+    sparkline_svg,
+)
+from alta_rollup import RANKINGS, WINDOWS, ArtistDayRing, DailyGrain
+from benchmarks.common import peak_rss_mb, run_meta, timed, write_report
+
+DEFAULT_SCALES = "100x14,1000x14,10000x28,10000x365,100000x14,100000x90,1000000x14"
+
+
+def parse_scales(text: str) -> list:
+    scales = []
+    for item in text.split(","):
+        artists, days = item.lower().split("x")
+        scales.append((int(artists), int(days)))
+    return scales
+
+
+def run_refresh(backend, days: int) -> dict:
+    """One full refresh; returns {stage: seconds}."""
+    timings = {}
+    timings["probe"], _ = timed(lambda: backend.execute(SOURCE_VERSION_QUERY))
+
+    parts = {}
+    for name, query in SNAPSHOT_QUERIES.items():
+        timings[f"fetch.{name}"], parts[name] = timed(lambda: normalize_snapshot_part(backend.execute(query)))
+
+    timings["assemble"], frame = timed(lambda: assemble_snapshot_frame(parts))
+    timings["aggregate.grain"], grain = timed(lambda: DailyGrain.from_frame(frame))
+    timings["aggregate.totals"], totals = timed(lambda: grain.totals(WINDOWS["7d"]))
+    timings["aggregate.metrics"], metrics = timed(lambda: get_overall_metrics(totals))
+    timings["aggregate.leaderboard"], artists = timed(lambda: get_artist_leaderboard(totals))
+    timings["aggregate.trends"], (card_trends, artist_trends) = timed(lambda: (
+        [get_overall_trend(grain, metric, TREND_DAYS) for metric in CARD_TRENDS.values()],
+        get_artist_trends(grain, artists["artist_name"], "total_streams", TREND_DAYS),
+    ))
+
+    def render():
+        cards = [
+            metric_card_html(label, metrics[curr], metrics[prev] if prev else None, show_delta=prev is not None)
+            for label, curr, prev in DASHBOARD_CARDS
+        ]
+        return cards, leaderboard_table_html(artists)
+
+    clear_render_caches()
+    timings["render.cards"], _ = timed(lambda: render()[0])
+    clear_render_caches()
+    timings["render.leaderboard"], _ = timed(lambda: leaderboard_table_html(artists))
+    # LTTB-thinned SVG for the trend cards and every leaderboard row
+    timings["render.sparklines"], _ = timed(lambda: (
+        [sparkline_svg(series, *CARD_SPARKLINE) for series in card_trends],
+        leaderboard_table_html(artists, trends=artist_trends),
+    ))
+    timings["total"] = sum(timings.values())
+
+    # A rerun over unchanged data gets the memoized markup back
+    timings["render.unchanged"], _ = timed(render)
+
+    # Switching the comparison window re-slices the same grain
+    timings["aggregate.all_windows"], _ = timed(lambda: [grain.totals(w) for w in WINDOWS.values()])
+    # and rotating the leaderboard re-ranks the same totals
+    timings["aggregate.all_rankings"], _ = timed(
+        lambda: [get_artist_leaderboard(totals, ranking=r) for r in RANKINGS.values()]
+    )
+
+    # What an incremental refresh pays locally instead of the aggregate stages:
+    # advancing an ArtistDayRing that already holds the rest by one new day,
+    # then taking the grain (and its roster trend) from the ring. The ring is
+    # sized to the days the scale actually has, not the full SNAPSHOT_DAYS,
+    # and the new day replays the latest day's rows.
+    ring = ArtistDayRing.from_frame(frame, min(days, SNAPSHOT_DAYS))
+    latest = frame["activity_date"].max()
+    next_day = latest + pd.Timedelta(days=1)
+    day = frame.loc[frame["activity_date"] == latest].assign(activity_date=next_day)
+    timings["rollup.day"], _ = timed(lambda: (ring.put_day(next_day, day), ring.grain().daily_totals))
+    return timings
+
+
+def bench_scale(artists: int, days: int, tracks_per_artist: int, repeat: int, seed: int) -> list:
+    backend = DuckDBBackend(n_artists=artists, n_days=days, tracks_per_artist=tracks_per_artist, seed=seed)
+    seed_s, _ = timed(backend.start)
+    streaming_rows = int(backend.execute(
+        "SELECT COUNT(*) AS n FROM stage_prod.streaming.orchard_track_artist_daily"
+    )["n"].iloc[0])
+
+    runs = [run_refresh(backend, days) for _ in range(repeat)]
+    backend.close()
+
+    base = {
+        "scale": f"{artists}x{days}",
+        "artists": artists,
+        "days": days,
+        "tracks_per_artist": tracks_per_artist,
+        "streaming_rows": streaming_rows,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    results = [dict(base, stage="setup.seed", runs_s=[seed_s], min_s=seed_s, median_s=seed_s)]
+    for stage in runs[0]:
+        values = [run[stage] for run in runs]
+        results.append(dict(base, stage=stage, runs_s=values, min_s=min(values), median_s=statistics.median(values)))
+    return results
+
+
+def _meta(args) -> dict:
+    import duckdb
+
+    return run_meta(
+        pandas=pd.__version__,
+        numpy=np.__version__,
+        duckdb=duckdb.__version__,
+        repeat=args.repeat,
+        seed=args.seed,
+    )
+
+
+def compare(current: dict, baseline: dict):
+    """Print median timings next to a baseline run; ratio > 1 means slower now."""
+    before = {(r["scale"], r["stage"]): r["median_s"] for r in baseline["results"]}
+    print(f"{'scale':>12} {'stage':<24} {'median_s':>10} {'baseline_s':>10} {'ratio':>7}")
+    for r in current["results"]:
+        old = before.get((r["scale"], r["stage"]))
+        ratio = f"{r['median_s'] / old:7.2f}" if old else "      -"
+        old_txt = f"{old:10.4f}" if old is not None else "         -"
+        print(f"{r['scale']:>12} {r['stage']:<24} {r['median_s']:10.4f} {old_txt} {ratio}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated ARTISTSxDAYS list")
+    parser.add_argument("--tracks-per-artist", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    args = parser.parse_args()
+
+    report = {"meta": _meta(args), "results": []}
+    for artists, days in parse_scales(args.scales):
+        print(f"benchmarking {artists} artists x {days} days ...", file=sys.stderr)
+        report["results"].extend(bench_scale(artists, days, args.tracks_per_artist, args.repeat, args.seed))
+
+    write_report(report, args.out)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
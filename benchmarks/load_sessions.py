@@ -0,0 +1,177 @@
+"""
+Load-test the dashboard with many simulated TV sessions in one process.
+
+Each session is a Streamlit AppTest of alta_dashboard.py. It opens the
+page the way a TV does (?token=..., no password form) and then reruns it
+every --interval seconds. Sessions share this process, and so its
+process-wide backend, refresher and caches, like sessions on one server.
+The data source is the local DuckDB backend. For each session count, the
+run reports:
+- rerun latency percentiles
+- process RSS, and the RSS added per session
+- CPU used, in cores busy over the run
+- warehouse queries issued
+
+    python -m benchmarks.load_sessions --sessions 1,10,25,50 --duration 60 --interval 5
+    python -m benchmarks.load_sessions --sessions 10 --out load.json
+
+Dashboard settings apply as usual through ALTA_* variables. For example,
+ALTA_REFRESH_SECONDS=10 includes background refresh traffic in a short
+run.
+
+Every rerun here is a full script run, which is what the old autorefresh
+cost each screen. With change-driven reruns, most screens only run the
+small watcher fragment between data changes, so these numbers are an
+upper bound on what N screens cost.
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.common import rss_mb, run_meta, write_report
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alta_dashboard.py")
+TOKEN = "load-test"
+
+
+def _queries() -> int:
+    from alta_data import get_backend
+
+    return get_backend().stats()["queries"]
+
+
+def open_session(index: int, timeout: float):
+    """An authenticated AppTest session that has rendered the page once."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.secrets["tv_token"] = TOKEN
+    at.query_params["token"] = TOKEN
+    at.query_params["screen"] = f"load-{index}"
+    at.run()
+    return at
+
+
+def _session_loop(at, interval: float, deadline: float, latencies: list, errors: list):
+    # Stagger the sessions over one interval, as screens would not refresh in lockstep
+    time.sleep(random.uniform(0, interval))
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            at.run()
+            if at.exception:
+                errors.append(at.exception[0].value)
+        except Exception as e:
+            errors.append(repr(e))
+        elapsed = time.perf_counter() - started
+        latencies.append(elapsed)
+        time.sleep(max(0.0, interval - elapsed))
+
+
+def run_level(sessions: int, duration: float, interval: float, timeout: float) -> dict:
+    gc.collect()
+    rss_before = rss_mb()
+    opened_at = time.perf_counter()
+    apps = [open_session(i, timeout) for i in range(sessions)]
+    open_s = time.perf_counter() - opened_at
+    rss_open = rss_mb()
+
+    latencies, errors = [], []
+    queries_before = _queries()
+    cpu_before = time.process_time()
+    started = time.monotonic()
+    deadline = started + duration
+    threads = [
+        threading.Thread(target=_session_loop, args=(at, interval, deadline, latencies, errors), daemon=True)
+        for at in apps
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - started
+    cpu = time.process_time() - cpu_before
+    queries = _queries() - queries_before
+    rss_after = rss_mb()
+
+    values = np.array(latencies) if latencies else np.array([np.nan])
+    del apps
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "open_s": open_s,
+        "rerun_p50_s": float(np.percentile(values, 50)),
+        "rerun_p90_s": float(np.percentile(values, 90)),
+        "rerun_p99_s": float(np.percentile(values, 99)),
+        "rerun_max_s": float(np.max(values)),
+        "reruns_per_s": len(latencies) / wall,
+        "rss_mb": rss_after,
+        "rss_per_session_mb": (rss_open - rss_before) / sessions,
+        "cpu_cores": cpu / wall,
+        "queries": queries,
+        "queries_per_min": queries * 60 / wall,
+    }
+
+
+def _meta(args) -> dict:
+    import streamlit
+
+    return run_meta(
+        streamlit=streamlit.__version__,
+        duration_s=args.duration,
+        interval_s=args.interval,
+        backend=os.environ.get("ALTA_BACKEND"),
+    )
+
+
+def print_table(results: list):
+    print(
+        f"{'sessions':>8} {'reruns':>7} {'err':>4} {'p50_s':>7} {'p90_s':>7} {'p99_s':>7} "
+        f"{'rss_mb':>8} {'mb/sess':>8} {'cores':>6} {'q/min':>7}",
+        file=sys.stderr,
+    )
+    for r in results:
+        print(
+            f"{r['sessions']:>8} {r['reruns']:>7} {r['errors']:>4} {r['rerun_p50_s']:7.3f} {r['rerun_p90_s']:7.3f} "
+            f"{r['rerun_p99_s']:7.3f} {r['rss_mb']:8.1f} {r['rss_per_session_mb']:8.2f} {r['cpu_cores']:6.2f} "
+            f"{r['queries_per_min']:7.1f}",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", default="1,5,10,25", help="comma-separated session counts")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to rerun each session count for")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between reruns of one session")
+    parser.add_argument("--timeout", type=float, default=120.0, help="AppTest timeout for one rerun")
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    # Settings are read when the dashboard modules are first imported
+    os.environ.setdefault("ALTA_BACKEND", "local")
+    os.environ.setdefault("ALTA_SNAPSHOT_CACHE_DIR", "")
+
+    # Warm the process (imports, local seed, first snapshot) before measuring
+    print("warming up ...", file=sys.stderr)
+    open_session(-1, args.timeout)
+
+    results = []
+    for n in [int(n) for n in args.sessions.split(",")]:
+        print(f"running {n} sessions for {args.duration:.0f}s ...", file=sys.stderr)
+        results.append(run_level(n, args.duration, args.interval, args.timeout))
+    print_table(results)
+
+    write_report({"meta": _meta(args), "results": results}, args.out)
+
+
+if __name__ == "__main__":
+    main()